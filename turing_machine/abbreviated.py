@@ -11,10 +11,14 @@ Email: metaescape@foxmail.com
 License: MIT License
 """
 
+import gc
+
 try:
     from turing_machine.op_extend import Table, TransitionRule, TuringMachine
+    from turing_machine.optimize import minimize
 except:
     from op_extend import Table, TransitionRule, TuringMachine
+    from optimize import minimize
 
 
 class SkelotonCompiler(type):
@@ -28,12 +32,27 @@ class SkelotonCompiler(type):
     _instances2name: dict = {}
     cnt = 1
     obj2name = {}
+    # m-configuration name -> class name of its abbreviated table, see cache.py
+    name2class = {}
     vocab = {"0", "1"}
+    # nesting depth of __call__, the outermost call pauses the garbage collector
+    building = 0
 
     def __call__(cls, *args, **kwargs):
         assert kwargs == {}, "SingletonMeta does not support kwargs"
-        key = f"{cls.__name__}{args}"
-        if key not in cls._instances:
+        # hash-consing: the arguments are strings or instances which are already interned,
+        # so (class, arguments) is hashed in O(len(args)), the instances by identity
+        key = (cls, args)
+        instance = cls._instances.get(key)
+        if instance is not None:
+            return instance
+        # the object graph only grows while building, and the cyclic collector
+        # would rescan all of it again and again: build it in one pause
+        paused = SkelotonCompiler.building == 0 and gc.isenabled()
+        if paused:
+            gc.disable()
+        SkelotonCompiler.building += 1
+        try:
             # call new to get a pure instance without content (no constructor called)
             instance = cls.__new__(cls, *args, **kwargs)
             # this line should be called before the init to avoid infinite loop
@@ -41,9 +60,11 @@ class SkelotonCompiler(type):
             cls._instances2name[instance] = key
             # call init to initialize the instance manually
             instance.__init__(*args, **kwargs)
-        else:
-            print(f"{key} exist, ignore")
-        return cls._instances[key]
+        finally:
+            SkelotonCompiler.building -= 1
+            if paused:
+                gc.enable()
+        return instance
 
     @classmethod
     def reset(cls):
@@ -51,6 +72,7 @@ class SkelotonCompiler(type):
         cls._instances2name = {}
         cls.cnt = 1
         cls.obj2name = {}
+        cls.name2class = {}
         cls.vocab = {"0", "1"}
 
     @classmethod
@@ -84,13 +106,45 @@ class SkelotonCompiler(type):
         return alias_map
 
     @classmethod
-    def compile(cls):
+    def compile(cls, entry=None):
         """
         generate machine code
         - build the alias map, then replace the object with the final alias obj(the public obj of the abbreviated table)
         - replace the state obj to a string (public name of the abbreviated table)
         - generate the low level transition rules
+        - with an entry (abbreviated table or m-config name), minimize the table from it, see optimize.py,
+          the merged objects share one name in obj2name and the pruned ones are removed
         """
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            table = cls._compile()
+            if entry is not None:
+                table = cls.minimize(table, entry)
+            return table
+        finally:
+            if enabled:
+                gc.enable()
+
+    @classmethod
+    def minimize(cls, table, entry):
+        if type(entry) != str:
+            entry = cls.get_m_config_name(entry)
+        table, _, renaming = minimize(table, entry)
+        cls.obj2name = {
+            obj: renaming[name]
+            for obj, name in cls.obj2name.items()
+            if name in renaming
+        }
+        cls.name2class = {
+            name: cls.name2class[name]
+            for name in set(cls.obj2name.values())
+            if name in cls.name2class
+        }
+        return table
+
+    @classmethod
+    def _compile(cls):
         table = Table()
         rules = []
 
@@ -124,6 +178,9 @@ class SkelotonCompiler(type):
             rule = TransitionRule(abb, symbol, operations, next_m_config)
             table.add_rule(rule)
 
+        cls.name2class = {
+            name: type(obj).__name__ for obj, name in cls.obj2name.items()
+        }
         return table
 
     @classmethod
@@ -264,7 +321,7 @@ class Copy(AbbreviatedTable):
 class Copy1(AbbreviatedTable):
     def __init__(self, success):
         super().__init__()
-        for alpha in SkelotonCompiler.vocab:  # current support "0", "1"
+        for alpha in sorted(SkelotonCompiler.vocab):  # current support "0", "1"
             self.add_transition(alpha, [], PrintEnd(success, alpha))
 
 
@@ -342,7 +399,7 @@ class Compare1(AbbreviatedTable):
         find x
         """
         super().__init__()
-        for alpha in SkelotonCompiler.vocab:
+        for alpha in sorted(SkelotonCompiler.vocab):
             self.add_transition(
                 alpha,
                 [],
@@ -786,6 +843,32 @@ def test_compile_erase_all_marks():
     return tm
 
 
+def test_hash_consing():
+    import io
+    import time
+    from contextlib import redirect_stdout
+
+    print("the same m-function with the same arguments is one instance")
+    timings = []
+    for depth in [1000, 4000]:
+        SkelotonCompiler.reset()
+        start = time.perf_counter()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            success = "success"
+            for _ in range(depth):
+                success = CopyThenEraseThree(success, "x", "y", "z")
+            again = "success"
+            for _ in range(depth):
+                again = CopyThenEraseThree(again, "x", "y", "z")
+            table = SkelotonCompiler.compile()
+        timings.append(time.perf_counter() - start)
+        assert again is success
+        assert output.getvalue() == ""
+    small, large = timings
+    print(f"{len(table.rules)} rules, depth 1000: {small:.3f}s, depth 4000: {large:.3f}s")
+
+
 if __name__ == "__main__":
 
     test_compile_erase()
@@ -799,3 +882,4 @@ if __name__ == "__main__":
     test_compile_find_right()
     test_compile_copy_then_erase_three()
     test_compile_erase_all_marks()
+    test_hash_consing()
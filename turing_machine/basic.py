@@ -6,19 +6,119 @@ the length of operation is 2, the first element is the symbol to write, the seco
 only support two directions: "L" and "R"
 
 do not support * match for any symbol
+
+The machine runs on the engine of compiled.py through BasicSemantics,
+which translates the table to the op_extend format once:
+
+- blank: None here, "_" in the engine
+- operations: [symbol or None, move] here, a list of any length in the engine,
+  None (or "") writes nothing, a move other than "L" and "R" does not move
+- tape growth: the engine grows its bytearray on both sides, max_right only follows the moves to the right
+- left edge: "clamp" (default) keeps the head at square 0 like the original interpreter,
+  a move to the left of square 0 leaves the head on square 0;
+  "infinite" lets the head go to the left of square 0, see tape.py
+- errors: the configuration of NoTransitionError is given in these symbols, the blank is None
 """
 
+try:
+    from turing_machine.op_extend import Table as CoreTable
+    from turing_machine.op_extend import TransitionRule as CoreRule
+    from turing_machine.op_extend import NoTransitionError
+    from turing_machine.compiled import CompiledTuringMachine
+    from turing_machine.fraction import sequence_to_decimal
+except:
+    from op_extend import Table as CoreTable
+    from op_extend import TransitionRule as CoreRule
+    from op_extend import NoTransitionError
+    from compiled import CompiledTuringMachine
+    from fraction import sequence_to_decimal
+
+
+class BasicSemantics:
+    """
+    translate the symbols and operations of basic.py to the engine and back
+    """
+
+    blank = None
+    core_blank = "_"
+
+    def __init__(self, left_edge="clamp"):
+        assert left_edge in ("clamp", "infinite"), f"Unknown left edge policy {left_edge}"
+        self.left_edge = left_edge
+
+    def to_core(self, symbol):
+        return self.core_blank if symbol == self.blank else symbol
+
+    def from_core(self, symbol):
+        return self.blank if symbol == self.core_blank else symbol
+
+    def operations(self, operations):
+        write_symbol, move = operations
+        result = [write_symbol] if write_symbol else []
+        if move in ("L", "R"):
+            result.append(move)
+        return result
+
+    def table(self, table):
+        core = CoreTable()
+        for (m_config, symbol), (operations, next_m_config) in table.table.items():
+            core.add_rule(
+                CoreRule(
+                    m_config,
+                    self.to_core(symbol),
+                    self.operations(operations),
+                    next_m_config,
+                )
+            )
+        return core
+
+
+class LeftEdge:
+    """
+    an observer of the engine which stops the run when the head goes to the left of square 0
+
+    a sweep (moves without writes in one m-configuration) which passes square 0
+    scans square 0 with the same rule again once the head is clamped,
+    so the clamped machine stays on square 0 for the rest of the run: `stuck`
+    """
+
+    def __init__(self):
+        self.stuck = False
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        return head < 0
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        self.stuck = head + count * move < 0
+        return self.stuck
+
 
 class TuringMachine:
     """
     This is a Turing machine interpreter, not a universal Turing machine.
     """
 
-    def __init__(self, table, initial_state):
-        self.tape = [None] * 2000
-        self.head_position = 0
+    def __init__(self, table, initial_state, semantics=None):
         self.table = table
-        self.current_state = initial_state
+        self.semantics = semantics or BasicSemantics()
+        self.core = CompiledTuringMachine(self.semantics.table(table), initial_state)
+        self.core.set_history_policy("off")
+        self.left_edge = None
+        if self.semantics.left_edge == "clamp":
+            self.left_edge = LeftEdge()
+            self.core.observers.append(self.left_edge)
+
+    @property
+    def head_position(self):
+        return self.core.head_position
+
+    @property
+    def current_state(self):
+        return self.core.current_state
+
+    @property
+    def max_right(self):
+        return self.core.max_right
 
     @property
     def m_configuration(self):
@@ -26,11 +126,7 @@ class TuringMachine:
 
     @property
     def scanned_symbol(self):
-        return (
-            self.tape[self.head_position]
-            if self.head_position < len(self.tape)
-            else " "
-        )
+        return self.semantics.from_core(self.core.scanned_symbol)
 
     @property
     def configuration(self):
@@ -38,66 +134,75 @@ class TuringMachine:
 
     @property
     def complete_configuration(self):
-        return (self.tape, self.head_position, self.m_configuration)
+        return (self.get_tape(), self.head_position, self.m_configuration)
 
     def get_tape(self):
-        return self.tape
+        tape = self.core.tape[: self.max_right + 1]
+        return [self.semantics.from_core(symbol) for symbol in tape]
 
     def get_sequence(self):
         result = []
-        for i in range(0, len(self.tape), 2):
-            if self.tape[i] in ("0", "1"):
-                result.append(self.tape[i])
+        for symbol in self.core.tape[0 : self.max_right + 1 : 2]:
+            if symbol in ("0", "1"):
+                result.append(symbol)
         return "".join(result)
 
     def get_binary(self):
         return "0." + self.get_sequence()
 
-    def get_decimal(self):
+    def get_decimal(self, digits=None):
         """
-        convert 0.01010101... to 1/3 in decimal
+        convert 0.01010101... to 1/3 in decimal, exactly, see fraction.py
+        digits: return a string of `digits` truncated decimal digits instead of a float
+
+        O(n) per call, after track_decimal it is read from the fraction the engine maintains
         """
-        sequence = self.get_sequence()
-        result = 0
-        for i in range(len(sequence)):
-            result += int(sequence[i]) * 2 ** (-i - 1)
-        return result
+        if self.core.fraction is not None:
+            return self.core.get_decimal(digits)
+        return sequence_to_decimal(self.get_sequence(), digits)
+
+    def track_decimal(self):
+        """maintain the value of the sequence while the machine runs, see op_extend.TuringMachine.track_decimal"""
+        return self.core.track_decimal()
 
-    def step(self):
+    def step(self, verbose=False):
         """执行图灵机的单步操作"""
-        configuration = self.configuration
-
-        print(configuration)
-        if configuration in self.table:
-            operations, next_m_config = self.table[configuration]
-            write_symbol, move = operations
-            if write_symbol:
-                self.tape[self.head_position] = write_symbol
-            if move == "R":
-                self.head_position += 1
-                if self.head_position >= len(self.tape):
-                    length_before = len(self.tape)
-                    self.tape.extend([None] * 2000)
-                    print(
-                        f"Warning: head position is out of tape,"
-                        f"extend tape from length {length_before} to {len(self.tape)}"
-                    )
-            elif move == "L":
-                self.head_position -= 1
-            if self.head_position < 0:
-                print("Warning: head position is negative, reset to 0")
-                self.head_position = 0
-            self.current_state = next_m_config
+        if verbose:
+            print(self.configuration)
+        self.advance(1)
 
+    def run(self, steps=1000, verbose=False):
+        """
+        运行图灵机直到达到终止状态
+        verbose: print the configuration before every step
+        """
+        if verbose:
+            for _ in range(steps):
+                self.step(verbose=True)
         else:
-            raise Exception(
-                "No transition defined for the current configuration"
-            )
-
-    def run(self, steps=1000):
-        """运行图灵机直到达到终止状态"""
-        for _ in range(steps):
-            self.step()
+            self.advance(steps)
+
+    def advance(self, steps):
+        """run the engine, clamp the head at square 0 and give the halting configuration in basic symbols"""
+        try:
+            if self.left_edge is None:
+                self.core.run(steps=steps)
+                return
+            while steps > 0:
+                start = self.core.step_count
+                self.core.run(steps=steps)
+                steps -= self.core.step_count - start
+                if self.core.head_position >= 0:
+                    continue
+                self.core.head_position = 0
+                if self.left_edge.stuck:
+                    self.core.step_count += steps
+                    self.left_edge.stuck = False
+                    return
+        except NoTransitionError:
+            raise NoTransitionError(
+                f"No transition defined for the current configuration {self.configuration}"
+            ) from None
 
 
 class TransitionRule:
@@ -167,10 +272,73 @@ def create_1_4_table():
     return bcdef_table
 
 
-if __name__ == "__main__":
+# Test Cases
+
 
+def test_basic_semantics():
     tm = TuringMachine(create_1_3_table(), "b")
+    tm.run(steps=7)
+    assert tm.complete_configuration == (
+        ["0", None, "1", None, "0", None, "1", None],
+        7,
+        "k",
+    )
+    assert tm.configuration == ("k", None)
+    tm.run(steps=93)
+    assert tm.get_sequence() == "01" * 25
+    assert tm.get_decimal(15) == "0.333333333333333"
+    tracked = TuringMachine(create_1_3_table(), "b")
+    tracked.track_decimal()
+    tracked.run(steps=100)
+    assert tracked.get_decimal(15) == tm.get_decimal(15)
+
+    tm = TuringMachine(create_1_4_table(), "b")
     tm.run(steps=20)
+    assert tm.get_binary() == "0.0100000000"
+    assert tm.get_decimal() == 0.25
+
+
+def test_left_edge():
+    table = Table()
+    table.add_rule(TransitionRule("b", None, ["0", "L"], "c"))
+    table.add_rule(TransitionRule("c", "0", ["1", "R"], "d"))
+    table.add_rule(TransitionRule("d", None, ["2", "L"], "e"))
+    table.add_rule(TransitionRule("e", "1", [None, "L"], "f"))
+    tm = TuringMachine(table, "b")
+    tm.run(steps=4)
+    assert tm.complete_configuration == (["1", "2"], 0, "f")
+    try:
+        tm.step()
+        assert False, "the machine halts"
+    except NoTransitionError as error:
+        assert "('f', '1')" in str(error), error
+
+    # the blank is given back as None
+    tm = TuringMachine(table, "b", BasicSemantics(left_edge="infinite"))
+    try:
+        tm.run(steps=4)
+        assert False, "the machine halts"
+    except NoTransitionError as error:
+        assert "('c', None)" in str(error), error
+    assert tm.head_position == -1
+
+    # a sweep to the left keeps the clamped head on square 0
+    table = Table()
+    table.add_rule(TransitionRule("b", None, ["x", "R"], "c"))
+    table.add_rule(TransitionRule("c", None, [None, "L"], "c"))
+    table.add_rule(TransitionRule("c", "x", [None, "L"], "c"))
+    tm = TuringMachine(table, "b")
+    tm.run(steps=1000)
+    assert tm.complete_configuration == (["x", None], 0, "c")
+    assert tm.core.step_count == 1000
+
+
+if __name__ == "__main__":
+    test_basic_semantics()
+    test_left_edge()
+
+    tm = TuringMachine(create_1_3_table(), "b")
+    tm.run(steps=20, verbose=True)
     print(tm.get_sequence())
     print(tm.get_decimal())
 
@@ -0,0 +1,360 @@
+"""
+Run thousands of small Turing machines in lock-step with NumPy.
+
+Exploring all the small tables (e.g. every 2-state table over "_", "0", "1") one TuringMachine
+object at a time costs one Python loop per machine and per step.
+BatchTuringMachine keeps N machines in arrays:
+
+- state, head, steps: one integer per machine
+- tape: a (N, width) matrix of symbol ids, the square 0 of every machine is the column `origin`
+- the transitions of all the tables stacked in flat arrays indexed by (machine, state id, symbol id),
+  the same programs as compiled.CompiledTable: the writes relative to the head, the net move,
+  the leftmost and rightmost offsets of the head, and the next state id (-1: no transition)
+
+One step of all the running machines is a few fancy indexing operations,
+the machines which halt or leave the tape are masked out of the next steps.
+
+Outcomes: "halted" (no transition), "overflow" (the head would leave the `width` squares)
+and "max_steps" for the machines still running.
+
+small_machines builds the batch of a range of numbers of the small tables directly as arrays:
+every (m-configuration, symbol) has 1 + len(symbols) * 3 * n_states choices,
+halt or (print a symbol, move L, R or N, go to an m-configuration),
+and a table number is written in this mixed radix, the first (q1, "_") being the lowest digit.
+small_table(number) is the op_extend Table of the same number.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+import numpy as np
+
+try:
+    from turing_machine.op_extend import Table, TransitionRule
+    from turing_machine.compiled import CompiledTable
+    from turing_machine.tape import SymbolTable
+except:
+    from op_extend import Table, TransitionRule
+    from compiled import CompiledTable
+    from tape import SymbolTable
+
+RUNNING, HALTED, OVERFLOW = 0, 1, 2
+OUTCOMES = {RUNNING: "max_steps", HALTED: "halted", OVERFLOW: "overflow"}
+MOVES = ["L", "R", "N"]
+OFFSETS = [-1, 1, 0]
+
+
+class BatchTuringMachine:
+    def __init__(self, tables, initial_states, width=512, origin=None):
+        """
+        tables: op_extend Tables, they share one symbol table
+        initial_states: the first m-configuration of every table, or one for all of them
+        origin: the column of the square 0, the middle of the tape by default
+        """
+        if isinstance(initial_states, str):
+            initial_states = [initial_states] * len(tables)
+        symbol_table = SymbolTable("_")
+        programs = [CompiledTable(table, symbol_table) for table in tables]
+        initial = [
+            program.intern_state(state)
+            for program, state in zip(programs, initial_states)
+        ]
+        for program in programs:
+            program.sync()
+        n_states = max(len(program.states) for program in programs)
+        rules = [
+            (i, state, symbol, rule)
+            for i, program in enumerate(programs)
+            for state, row in enumerate(program.rows)
+            for symbol, rule in enumerate(row)
+            if rule is not None
+        ]
+        n_writes = max([len(rule[0]) for *_, rule in rules] + [1])
+        shape = (len(programs), n_states, len(symbol_table))
+        next_state = np.full(shape, -1, dtype=np.int32)
+        move = np.zeros(shape, dtype=np.int32)
+        lo = np.zeros(shape, dtype=np.int32)
+        hi = np.zeros(shape, dtype=np.int32)
+        write_offset = np.zeros(shape + (n_writes,), dtype=np.int32)
+        write_symbol = np.full(shape + (n_writes,), -1, dtype=np.int16)
+        for i, state, symbol, rule in rules:
+            key = (i, state, symbol)
+            writes, move[key], lo[key], hi[key], next_state[key], _ = rule
+            for w, (offset, code) in enumerate(writes):
+                write_offset[key + (w,)] = offset
+                write_symbol[key + (w,)] = code
+        self.states = [program.states for program in programs]
+        self.setup(
+            symbol_table.symbols,
+            next_state,
+            move,
+            lo,
+            hi,
+            write_offset,
+            write_symbol,
+            np.array(initial),
+            width,
+            origin,
+        )
+
+    @classmethod
+    def from_arrays(
+        cls, symbols, next_state, write, move, initial=0, width=512, origin=None
+    ):
+        """
+        machines which write one symbol on the scanned square (-1: no write) and move by `move`,
+        all the arrays have the shape (N, states, symbols), symbols[0] is the blank
+        """
+        batch = cls.__new__(cls)
+        batch.states = None
+        batch.setup(
+            list(symbols),
+            next_state.astype(np.int32),
+            move.astype(np.int32),
+            np.minimum(move, 0).astype(np.int32),
+            np.maximum(move, 0).astype(np.int32),
+            np.zeros(next_state.shape + (1,), dtype=np.int32),
+            write.astype(np.int16)[..., None],
+            np.full(len(next_state), initial),
+            width,
+            origin,
+        )
+        return batch
+
+    def setup(
+        self,
+        symbols,
+        next_state,
+        move,
+        lo,
+        hi,
+        write_offset,
+        write_symbol,
+        initial,
+        width,
+        origin,
+    ):
+        n, n_states, n_symbols = next_state.shape
+        self.symbols = symbols
+        self.size = n
+        self.width = width
+        self.origin = width // 2 if origin is None else origin
+        # flat index of a transition: (machine * n_states + state) * n_symbols + symbol
+        self.stride = (n_states * n_symbols, n_symbols)
+        self.next_state = next_state.reshape(-1)
+        self.move = move.reshape(-1)
+        self.lo = lo.reshape(-1)
+        self.hi = hi.reshape(-1)
+        self.write_offset = write_offset.reshape(-1, write_offset.shape[-1])
+        self.write_symbol = write_symbol.reshape(-1, write_symbol.shape[-1])
+
+        self.tape = np.zeros((n, width), dtype=np.uint8)
+        self.state = initial.astype(np.int32)
+        self.head = np.full(n, self.origin, dtype=np.int64)
+        self.max_right = np.full(n, self.origin, dtype=np.int64)
+        self.min_left = np.full(n, self.origin, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.outcome = np.full(n, RUNNING, dtype=np.int8)
+        self.active = np.arange(n)
+
+    def step(self):
+        """one step of every running machine, return the number of machines still running"""
+        active = self.active
+        head = self.head[active]
+        state = self.state[active]
+        scanned = self.tape[active, head]
+        rule = active * self.stride[0] + state * self.stride[1] + scanned
+        next_state = self.next_state[rule]
+        lo = head + self.lo[rule]
+        hi = head + self.hi[rule]
+
+        halted = next_state < 0
+        overflow = ~halted & ((lo < 0) | (hi >= self.width))
+        if halted.any() or overflow.any():
+            self.outcome[active[halted]] = HALTED
+            self.outcome[active[overflow]] = OVERFLOW
+            keep = ~(halted | overflow)
+            active, head, rule = active[keep], head[keep], rule[keep]
+            next_state, lo, hi = next_state[keep], lo[keep], hi[keep]
+            self.active = active
+
+        for w in range(self.write_symbol.shape[1]):
+            code = self.write_symbol[rule, w]
+            mask = code >= 0
+            if mask.all():
+                self.tape[active, head + self.write_offset[rule, w]] = code
+            elif mask.any():
+                squares = head[mask] + self.write_offset[rule[mask], w]
+                self.tape[active[mask], squares] = code[mask]
+        self.head[active] = head + self.move[rule]
+        self.state[active] = next_state
+        self.steps[active] += 1
+        self.max_right[active] = np.maximum(self.max_right[active], hi)
+        self.min_left[active] = np.minimum(self.min_left[active], lo)
+        return len(active)
+
+    def run(self, steps=1000):
+        for _ in range(steps):
+            if not self.step():
+                break
+
+    def get_tape(self, i):
+        """squares min_left .. max_right of the machine i, as TuringMachine.get_tape"""
+        codes = self.tape[i, self.min_left[i] : self.max_right[i] + 1]
+        return [self.symbols[code] for code in codes]
+
+    def get_sequence(self, i):
+        codes = self.tape[i, self.origin : self.max_right[i] + 1 : 2]
+        sequence = (self.symbols[code] for code in codes)
+        return "".join(symbol for symbol in sequence if symbol not in ("$", "_"))
+
+    def m_configuration(self, i):
+        state = self.state[i]
+        return self.states[i][state] if self.states else f"q{state + 1}"
+
+    def results(self, figures=64):
+        """the outcome, steps and figures of every machine, as enumerator.run_machine"""
+        return [
+            {
+                "outcome": OUTCOMES[self.outcome[i]],
+                "steps": int(self.steps[i]),
+                "figures": self.get_sequence(i)[:figures],
+            }
+            for i in range(self.size)
+        ]
+
+
+def count_small_tables(n_states, symbols=("_", "0", "1")):
+    choices = 1 + len(symbols) * len(MOVES) * n_states
+    return choices ** (n_states * len(symbols))
+
+
+def small_machines(n_states, start, stop, symbols=("_", "0", "1"), width=512):
+    """the batch of the small tables numbered start .. stop - 1, in m-configuration q1"""
+    n_symbols = len(symbols)
+    choices = 1 + n_symbols * len(MOVES) * n_states
+    numbers = np.arange(start, stop, dtype=object)
+    shape = (len(numbers), n_states, n_symbols)
+    digits = np.zeros(shape, dtype=np.int64)
+    for state in range(n_states):
+        for symbol in range(n_symbols):
+            digits[:, state, symbol] = (numbers % choices).astype(np.int64)
+            numbers //= choices
+    # a digit d > 0 is 1 + (write * 3 + move) * n_states + next state
+    choice = digits - 1
+    next_state = np.where(digits > 0, choice % n_states, -1)
+    action = choice // n_states
+    write = np.where(digits > 0, action // len(MOVES), -1)
+    move = np.where(digits > 0, np.array(OFFSETS)[action % len(MOVES)], 0)
+    return BatchTuringMachine.from_arrays(symbols, next_state, write, move, 0, width)
+
+
+def small_table(n_states, number, symbols=("_", "0", "1")):
+    """the op_extend Table of a small table number, see small_machines"""
+    choices = 1 + len(symbols) * len(MOVES) * n_states
+    table = Table()
+    for state in range(n_states):
+        for symbol in symbols:
+            number, digit = divmod(number, choices)
+            if digit == 0:
+                continue
+            action, next_state = divmod(digit - 1, n_states)
+            write, move = divmod(action, len(MOVES))
+            table.add_rule(
+                TransitionRule(
+                    f"q{state + 1}",
+                    symbol,
+                    [symbols[write], MOVES[move]],
+                    f"q{next_state + 1}",
+                )
+            )
+    return table
+
+
+# Test Cases
+
+
+def run_single(table, steps, initial="q1"):
+    try:
+        from turing_machine.compiled import CompiledTuringMachine
+    except:
+        from compiled import CompiledTuringMachine
+
+    tm = CompiledTuringMachine(table, initial)
+    tm.set_history_policy("off")
+    outcome, done = tm.run_until(max_steps=steps, detect_cycle=False)
+    return tm, {"outcome": outcome, "steps": done, "figures": tm.get_sequence()[:64]}
+
+
+def test_small_machines():
+    steps = 100
+    start = 123456
+    batch = small_machines(2, start, start + 2000, width=2 * steps + 8)
+    batch.run(steps)
+    results = batch.results()
+    for i, result in enumerate(results):
+        tm, expected = run_single(small_table(2, start + i), steps)
+        assert result == expected, (start + i, result, expected)
+        if tm.head_position < 0 or tm.min_left < 0:
+            continue
+        assert batch.get_tape(i)[batch.origin - batch.min_left[i] :] == tm.get_tape()
+        assert batch.m_configuration(i) == tm.m_configuration
+    halted = sum(result["outcome"] == "halted" for result in results)
+    print(f"{len(results)} of {count_small_tables(2)} 2-state machines, {halted} halted")
+
+
+def test_batch_tables():
+    try:
+        from turing_machine.op_extend import create_sqrt2_table
+    except:
+        from op_extend import create_sqrt2_table
+
+    table = Table()
+    description = [
+        ("b", "_", ["$", "R", "$", "R", "0", "R", "R", "0", "L", "L"], "o"),
+        ("o", "1", ["R", "x", "L", "L", "L"], "o"),
+        ("o", "0", [], "q"),
+        ("q", "*", ["R", "R"], "q"),
+        ("q", "_", ["1", "L"], "p"),
+        ("p", "x", ["_", "R"], "q"),
+        ("p", "$", ["R"], "f"),
+        ("p", "_", ["L", "L"], "p"),
+        ("f", "*", ["R", "R"], "f"),
+        ("f", "_", ["0", "L", "L"], "o"),
+    ]
+    for rule in description:
+        table.add_rule(TransitionRule(*rule))
+    tables, initial_states = [table, create_sqrt2_table()], ["b", "begin"]
+
+    steps = 3000
+    batch = BatchTuringMachine(tables, initial_states, width=1024, origin=8)
+    batch.run(steps)
+    for i, each in enumerate(tables):
+        tm, expected = run_single(each, steps, initial_states[i])
+        assert batch.results()[i] == expected
+        assert batch.get_tape(i) == tm.get_tape()
+        assert batch.m_configuration(i) == tm.m_configuration
+    print(batch.results())
+
+
+def test_batch_speed():
+    import time
+
+    steps = 200
+    start = time.perf_counter()
+    batch = small_machines(3, 10**9, 10**9 + 20000, width=2 * steps + 8)
+    batch.run(steps)
+    elapsed = time.perf_counter() - start
+    outcomes = [result["outcome"] for result in batch.results()]
+    print(
+        f"20000 3-state machines, {steps} steps: {elapsed:.2f}s,",
+        {outcome: outcomes.count(outcome) for outcome in set(outcomes)},
+    )
+
+
+if __name__ == "__main__":
+    test_small_machines()
+    test_batch_tables()
+    test_batch_speed()
@@ -0,0 +1,236 @@
+"""
+On-disk cache of the compiled tables.
+
+create_universal_machine builds the object graph of EntryUTM and compiles it with SkelotonCompiler
+on every call, and an Assembler re-encodes its table every time.
+Both results only depend on their definitions, so they are stored in files named by a hash:
+
+- compiled abbreviated tables: the source files of the AbbreviatedTable classes the entry can refer to,
+  the vocabulary and the entry
+- standard descriptions: the rules of the table and the two vocabularies
+
+The numbering of the states and symbols is canonical: SkelotonCompiler and Assembler
+iterate the vocabularies in sorted order, so every process computes (and caches) the same result.
+
+The files are json, written to a temporary file and renamed, so the workers of a pool
+can share the directory. The directory is $TURING_MACHINE_CACHE, or ~/.cache/turing_machine.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+import hashlib
+import inspect
+import json
+import os
+
+try:
+    from turing_machine.op_extend import Table, TransitionRule
+    from turing_machine.abbreviated import SkelotonCompiler, AbbreviatedTable
+    from turing_machine.encoding import Assembler
+except:
+    from op_extend import Table, TransitionRule
+    from abbreviated import SkelotonCompiler, AbbreviatedTable
+    from encoding import Assembler
+
+VERSION = 1
+
+
+def cache_dir():
+    default = os.path.join(os.path.expanduser("~"), ".cache", "turing_machine")
+    return os.environ.get("TURING_MACHINE_CACHE", default)
+
+
+def digest(*parts):
+    content = json.dumps([VERSION, *parts], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def load(kind, key):
+    path = os.path.join(cache_dir(), f"{kind}-{key}.json")
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def store(kind, key, value):
+    directory = cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{kind}-{key}.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+def table_to_rules(table: Table):
+    return [
+        [rule.m_config, rule.symbols, rule.operations, rule.next_m_config]
+        for rule in table.rules
+    ]
+
+
+def rules_to_table(rules):
+    table = Table()
+    for m_config, symbols, operations, next_m_config in rules:
+        rule = TransitionRule(m_config, symbols, operations, next_m_config)
+        table.add_rule(rule)
+    return table
+
+
+def definition_modules(entry):
+    """
+    the module of entry, and the modules of the AbbreviatedTable classes in its namespace, recursively
+
+    an abbreviated table only refers to the classes in the namespace of its module,
+    so the result depends on entry, not on the other modules the process has imported
+    """
+    modules = {}
+    pending = [inspect.getmodule(entry)]
+    while pending:
+        module = pending.pop()
+        path = inspect.getsourcefile(module)
+        if path in modules:
+            continue
+        modules[path] = module
+        for value in vars(module).values():
+            if isinstance(value, type) and issubclass(value, AbbreviatedTable):
+                pending.append(inspect.getmodule(value))
+    return modules
+
+
+def definitions_key(entry, vocab, args=()):
+    """
+    hash of the source files which define the AbbreviatedTable classes entry can refer to,
+    reading a few files is much faster than inspect.getsource for every class
+    """
+    sources = []
+    for path in definition_modules(entry):
+        with open(path, "rb") as f:
+            sources.append(hashlib.sha256(f.read()).hexdigest())
+    return digest(sorted(sources), sorted(vocab), entry.__name__, list(args))
+
+
+def compile_abbreviated(entry, vocab, args=()):
+    """
+    reset SkelotonCompiler, compile entry(*args) over `vocab`,
+    return the table, the name of the first m-configuration and the class name of every m-configuration
+
+    the compiled table is read from the cache when the definitions did not change,
+    then SkelotonCompiler is reset, and SkelotonCompiler.name2class is set in both cases
+    """
+    key = definitions_key(entry, vocab, args)
+    cached = load("abbreviated", key)
+    if cached is None:
+        SkelotonCompiler.reset()
+        SkelotonCompiler.set_vocab(set(vocab))
+        start = entry(*args)
+        table = SkelotonCompiler.compile()
+        cached = {
+            "rules": table_to_rules(table),
+            "entry": SkelotonCompiler.get_m_config_name(start),
+            "classes": SkelotonCompiler.name2class,
+        }
+        store("abbreviated", key, cached)
+    else:
+        # the same state of the compiler as after a compile, without the object graph
+        SkelotonCompiler.reset()
+        SkelotonCompiler.set_vocab(set(vocab))
+    SkelotonCompiler.name2class = cached["classes"]
+    return rules_to_table(cached["rules"]), cached["entry"], cached["classes"]
+
+
+def standard_description(table: Table, figure_vocab: set, erase_vocab: set):
+    """Assembler(table, figure_vocab, erase_vocab).standard_description, cached"""
+    key = digest(table_to_rules(table), sorted(figure_vocab), sorted(erase_vocab))
+    cached = load("description", key)
+    if cached is None:
+        cached = Assembler(table, figure_vocab, erase_vocab).standard_description
+        store("description", key, cached)
+    return cached
+
+
+# Test Cases
+
+
+def test_cached_universal_table():
+    import subprocess
+    import sys
+    import tempfile
+    import time
+
+    import importlib
+
+    try:
+        from turing_machine.universal import EntryUTM, UNIVERSAL_VOCAB
+    except:
+        from universal import EntryUTM, UNIVERSAL_VOCAB
+
+    # the key does not depend on the other modules which define abbreviated tables
+    key = definitions_key(EntryUTM, UNIVERSAL_VOCAB)
+    try:
+        importlib.import_module("turing_machine.self")
+    except ImportError:
+        importlib.import_module("self")
+    assert definitions_key(EntryUTM, UNIVERSAL_VOCAB) == key
+
+    os.environ["TURING_MACHINE_CACHE"] = tempfile.mkdtemp()
+    timings = []
+    for _ in range(2):
+        start = time.perf_counter()
+        table, entry, classes = compile_abbreviated(EntryUTM, UNIVERSAL_VOCAB)
+        timings.append(time.perf_counter() - start)
+    assert len(os.listdir(cache_dir())) == 1
+    assert classes[entry] == "EntryUTM"
+    # a hit leaves the compiler as reset, with the class names of the table
+    assert SkelotonCompiler.get_objs() == {} and SkelotonCompiler.cnt == 1
+    assert SkelotonCompiler.name2class == classes
+    compile_time, load_time = timings
+    print(f"{len(table.rules)} rules, compile {compile_time:.3f}s, load {load_time:.3f}s")
+
+    # another process with another hash seed finds the same file
+    script = (
+        "from turing_machine.cache import compile_abbreviated, cache_dir;"
+        "from turing_machine.universal import EntryUTM, UNIVERSAL_VOCAB;"
+        "import os;"
+        "os.environ['TURING_MACHINE_CACHE'] += '-fresh';"
+        "t, e, _ = compile_abbreviated(EntryUTM, UNIVERSAL_VOCAB);"
+        "print(len(os.listdir(cache_dir())), len(t.rules), e)"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        capture_output=True,
+        text=True,
+        cwd=root,
+        env=dict(os.environ, PYTHONHASHSEED="7"),
+    ).stdout.split()[-3:]
+    fresh = os.environ["TURING_MACHINE_CACHE"] + "-fresh"
+    assert output == ["1", str(len(table.rules)), entry], output
+    assert os.listdir(fresh) == os.listdir(cache_dir())
+    with open(os.path.join(fresh, os.listdir(fresh)[0])) as f:
+        assert json.load(f)["rules"] == table_to_rules(table)
+
+
+def test_cached_standard_description():
+    import tempfile
+
+    os.environ["TURING_MACHINE_CACHE"] = tempfile.mkdtemp()
+    table = Table()
+    table.add_rule(TransitionRule("b", "*", ["0", "R", "x", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["1", "R"], "b"))
+    vocab = ({"0", "1", "$", "a"}, {"_", "x", "y"})
+    description = Assembler(table, *vocab).standard_description
+    assert standard_description(table, *vocab) == description
+    assert standard_description(table, *vocab) == description
+    assert len(os.listdir(cache_dir())) == 1
+    print(description)
+
+
+if __name__ == "__main__":
+    test_cached_universal_table()
+    test_cached_standard_description()
@@ -0,0 +1,198 @@
+"""
+Binary checkpoints of a Turing machine, to resume a long run after a crash.
+
+File layout:
+
+    header   struct HEADER: magic, version, flags, step counter, head, max_right, min_left,
+             first square of the saved tape, number of saved squares, size of the metadata
+    metadata pickle of the m-configuration, the symbols, fill_len and the history recorder
+    padding  up to a multiple of mmap.ALLOCATIONGRANULARITY
+    tape     one byte per square, the codes of the symbols (index in the saved symbols)
+
+On load the tape of a compact machine is a copy-on-write mmap of the file,
+so restoring a large tape does not read it: the pages are loaded when the machine reads them,
+and the file is never modified (see ByteTape).
+A machine with a paged tape gets its squares back through PagedTape.write, blank pages are skipped.
+
+The observers (e.g. the cycle detector of run_until) are not saved.
+The metadata is a pickle: only load checkpoints you wrote.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+import mmap
+import os
+import pickle
+import struct
+
+try:
+    from turing_machine.tape import ByteTape, SymbolTable
+    from turing_machine.op_extend import NoTransitionError
+except:
+    from tape import ByteTape, SymbolTable
+    from op_extend import NoTransitionError
+
+MAGIC = b"TMCP"
+VERSION = 1
+HEADER = struct.Struct("<4sHHqqqqqqq")
+COMPACT = 1
+
+
+def save(tm, path):
+    """
+    write the checkpoint to a temporary file and rename it,
+    a crash while saving leaves the previous checkpoint intact
+    """
+    if isinstance(tm.tape, ByteTape):
+        symbols = tm.tape.symbols.symbols
+        start, _ = tm.tape.bounds()
+        tape = tm.tape.buffer
+        flags = COMPACT
+    else:
+        table = SymbolTable(tm.tape.blank)
+        start, stop = tm.tape.bounds()
+        tape = table.encode(tm.tape[start:stop])
+        symbols = table.symbols
+        flags = 0
+    metadata = pickle.dumps(
+        {
+            "m_config": tm.current_state,
+            "symbols": symbols,
+            "fill_len": tm.fill_len,
+            "recorder": tm.recorder,
+        }
+    )
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        flags,
+        tm.step_count,
+        tm.head_position,
+        tm.max_right,
+        tm.min_left,
+        start,
+        len(tape),
+        len(metadata),
+    )
+    offset = tape_offset(len(metadata))
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(metadata)
+        f.write(bytes(offset - HEADER.size - len(metadata)))
+        f.write(tape)
+    os.replace(tmp, path)
+
+
+def tape_offset(metadata_size):
+    size = HEADER.size + metadata_size
+    granularity = mmap.ALLOCATIONGRANULARITY
+    return (size + granularity - 1) // granularity * granularity
+
+
+def load(tm, path):
+    """
+    restore the checkpoint into `tm`, a machine built with the same table
+    """
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        magic, version, flags, *fields, metadata_size = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise Exception(f"{path} is not a checkpoint of version {VERSION}")
+        step_count, head, max_right, min_left, start, length = fields
+        metadata = pickle.loads(f.read(metadata_size))
+        offset = tape_offset(metadata_size)
+        if length == 0:
+            codes = bytearray()
+        else:
+            codes = mmap.mmap(
+                f.fileno(), length, access=mmap.ACCESS_COPY, offset=offset
+            )
+
+    table = SymbolTable(metadata["symbols"][0])
+    for symbol in metadata["symbols"]:
+        table.intern(symbol)
+    if isinstance(tm.tape, ByteTape):
+        tape = ByteTape(table)
+        tape.buffer = codes
+        tape.origin = -start
+    else:
+        tape = type(tm.tape)(table.symbols[0])
+        tape.write(start, table.decode(codes))
+
+    tm.tape = tape
+    tm.head_position = head
+    tm.max_right = max_right
+    tm.min_left = min_left
+    tm.step_count = step_count
+    tm.current_state = metadata["m_config"]
+    tm.fill_len = metadata["fill_len"]
+    tm.recorder = metadata["recorder"]
+    return tm
+
+
+def run(tm, steps, path, every=100000):
+    """
+    run `steps` steps and save a checkpoint every `every` steps, at the end and when the machine halts
+    """
+    done = 0
+    try:
+        while done < steps:
+            chunk = min(every, steps - done)
+            start = tm.step_count
+            tm.run(steps=chunk)
+            save(tm, path)
+            if tm.step_count - start < chunk:
+                return
+            done += chunk
+    except NoTransitionError:
+        save(tm, path)
+        raise
+
+
+# Test Cases
+
+
+def test_checkpoint():
+    import tempfile
+
+    try:
+        from turing_machine.op_extend import TuringMachine, create_sqrt2_table
+        from turing_machine.compiled import CompiledTuringMachine, assert_same_machine
+    except:
+        from op_extend import TuringMachine, create_sqrt2_table
+        from compiled import CompiledTuringMachine, assert_same_machine
+
+    table = create_sqrt2_table()
+    path = os.path.join(tempfile.mkdtemp(), "sqrt2.ckpt")
+    for machine in [
+        lambda: TuringMachine(table, "begin"),
+        lambda: TuringMachine(table, "begin", compact=True),
+        lambda: CompiledTuringMachine(table, "begin"),
+    ]:
+        reference = machine()
+        reference.set_history_policy("ring", 5)
+        reference.run(steps=3000)
+
+        tm = machine()
+        tm.set_history_policy("ring", 5)
+        run(tm, 1000, path, every=300)
+        resumed = load(machine(), path)
+        assert resumed.step_count == 1000
+        resumed.run(steps=2000)
+        assert_same_machine(reference, resumed)
+        assert reference.history == resumed.history
+        assert reference.step_count == resumed.step_count
+        print(type(resumed.tape).__name__, resumed.get_binary())
+
+    compiled = CompiledTuringMachine(table, "begin").load_checkpoint(path)
+    interpreted = TuringMachine(table, "begin").load_checkpoint(path)
+    assert compiled.get_tape() == interpreted.get_tape()
+    print(f"checkpoint size: {os.path.getsize(path)} bytes")
+
+
+if __name__ == "__main__":
+    test_checkpoint()
@@ -0,0 +1,309 @@
+"""
+Generate the Python source of a runner specialized for one Table.
+
+The compiled engine (compiled.py) still interprets a program tuple on every step:
+it indexes the rows, unpacks the tuple and loops over the writes.
+Here the CompiledTable is turned into the source of one function, compiled once with `exec`:
+
+- the m-configuration id and the head are local variables;
+- the m-configuration is dispatched with a binary tree of `if state < k`;
+- in every m-configuration the scanned symbol is dispatched with `if symbol == ...` chains,
+  the "*" rule is the `else` branch;
+- the writes, the move, the bounds and the next m-configuration of every rule are inlined as constants;
+- a scan loop searches one window of 64 squares with bytearray.translate and find,
+  with its stride and stop symbols inlined, and only calls compiled.scan when the window has no stop symbol.
+
+The loop only runs while the head is at least `reach` squares (the largest offset of a rule)
+away from both ends of the bytearray, so a rule never checks the bounds of the tape,
+the driver grows the tape and runs the function again.
+
+The dispatch costs about log2(number of m-configurations) comparisons per step.
+On create_sqrt2_table (27 m-configurations) the runner is about 1.5 times as fast as the compiled engine
+(2,000,000 steps in 0.15s instead of 0.23s): most of the steps are scans which stop within a window,
+they skip the call to compiled.scan. Small tables whose steps are not scans, such as the 1/3 table
+(b, c, e, k in basic.py), run about 1.7 to 2 times as fast.
+Beyond MAX_STATES m-configurations the comparisons cost more than indexing the rows,
+e.g. the universal machine (about 1000 m-configurations) is slower with a runner,
+so these tables run on the compiled engine and no source is generated.
+
+The source and the function are cached on the Table (Table.generated),
+a new machine with the same table does not generate them again.
+
+GeneratedTuringMachine has the same interface as CompiledTuringMachine,
+it falls back to the compiled engine when a history or an observer records the steps,
+or when the table has more than MAX_STATES m-configurations.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+try:
+    from turing_machine.op_extend import Table, TransitionRule, NoTransitionError
+    from turing_machine.compiled import CompiledTable, CompiledTuringMachine, scan
+except:
+    from op_extend import Table, TransitionRule, NoTransitionError
+    from compiled import CompiledTable, CompiledTuringMachine, scan
+
+DONE, GROW, HALT = 0, 1, 2
+WINDOW = 64
+MAX_STATES = 256
+
+
+class CodeGenerator:
+    def __init__(self, program: CompiledTable):
+        self.program = program
+        self.stops = []
+        self.reach = 1
+        for row in program.rows:
+            for rule in row:
+                if rule is not None:
+                    self.reach = max(self.reach, -rule[2], rule[3])
+
+    def generate(self):
+        """the source of run(tape, head, state, max_right, min_left, steps)"""
+        lines = [
+            "def run(tape, head, state, max_right, min_left, steps):",
+            f"    low, high = {self.reach}, len(tape) - {self.reach}",
+            "    n = 0",
+            "    while n < steps:",
+            "        if head < low or head >= high:",
+            f"            return n, head, state, max_right, min_left, {GROW}",
+            "        symbol = tape[head]",
+        ]
+        self.dispatch_state(lines, 0, len(self.program.states), 2)
+        lines.append("        n += 1")
+        lines.append(f"    return n, head, state, max_right, min_left, {DONE}")
+        return "\n".join(lines) + "\n"
+
+    def dispatch_state(self, lines, start, stop, depth):
+        indent = "    " * depth
+        if stop - start == 1:
+            self.dispatch_symbol(lines, start, depth)
+            return
+        middle = (start + stop) // 2
+        lines.append(f"{indent}if state < {middle}:")
+        self.dispatch_state(lines, start, middle, depth + 1)
+        lines.append(f"{indent}else:")
+        self.dispatch_state(lines, middle, stop, depth + 1)
+
+    def dispatch_symbol(self, lines, state_id, depth):
+        indent = "    " * depth
+        default = self.program.defaults[state_id]
+        cases = {}
+        for symbol_id, rule in enumerate(self.program.rows[state_id]):
+            if rule != default:
+                cases.setdefault(rule, []).append(symbol_id)
+
+        keyword = "if"
+        for rule, symbol_ids in cases.items():
+            condition = " or ".join(f"symbol == {i}" for i in symbol_ids)
+            lines.append(f"{indent}{keyword} {condition}:")
+            self.inline_rule(lines, rule, depth + 1, state_id)
+            keyword = "elif"
+        if keyword == "elif":
+            lines.append(f"{indent}else:")
+            depth += 1
+        self.inline_rule(lines, default, depth, state_id)
+
+    def inline_rule(self, lines, rule, depth, state_id):
+        indent = "    " * depth
+        if rule is None:
+            lines.append(
+                f"{indent}return n, head, state, max_right, min_left, {HALT}"
+            )
+            return
+        writes, move, lo, hi, next_state, stop = rule
+        if stop is not None:
+            self.stops.append(stop)
+            stops = f"STOPS[{len(self.stops) - 1}]"
+            # most scans stop within a few squares: one search over a window, compiled.scan for the rest
+            if move > 0:
+                window = f"tape[head : head + {WINDOW * move} : {move}]"
+            else:
+                window = (
+                    f"tape[head : head - {-WINDOW * move} if head >= {-WINDOW * move} else None"
+                    f" : {move}]"
+                )
+            lines.append(f"{indent}count = {window}.translate({stops}).find(1)")
+            lines.append(f"{indent}if count < 0 or count > steps - n:")
+            lines.append(
+                f"{indent}    count = scan(tape, head, {move}, {stops}, steps - n)"
+            )
+            lines.append(f"{indent}head += count * {move}")
+            lines.append(f"{indent}n += count")
+            if move > 0:
+                lines.append(f"{indent}if head > max_right: max_right = head")
+            else:
+                lines.append(f"{indent}if head < min_left: min_left = head")
+            lines.append(f"{indent}continue")
+            return
+        body = len(lines)
+        for offset, code in writes:
+            lines.append(f"{indent}tape[head + {offset}] = {code}")
+        if hi:
+            lines.append(f"{indent}if head + {hi} > max_right: max_right = head + {hi}")
+        if lo:
+            lines.append(f"{indent}if head + {lo} < min_left: min_left = head + {lo}")
+        if move:
+            lines.append(f"{indent}head += {move}")
+        if next_state != state_id:
+            lines.append(f"{indent}state = {next_state}")
+        if len(lines) == body:
+            # no write, no move and the same m-configuration, e.g. [] or ["N"]
+            lines.append(f"{indent}pass")
+
+    def compile(self):
+        source = self.generate()
+        namespace = {"scan": scan, "STOPS": self.stops}
+        exec(compile(source, "<generated runner>", "exec"), namespace)
+        return source, namespace["run"]
+
+
+def generate_runner(program: CompiledTable):
+    """
+    return (source, run, reach), cached on the table
+    the key contains the ids of the m-configurations and symbols the source depends on
+    """
+    key = (tuple(program.states), tuple(program.symbols))
+    generated = program.table.generated
+    if key not in generated:
+        generator = CodeGenerator(program)
+        source, run = generator.compile()
+        generated[key] = (source, run, generator.reach)
+    return generated[key]
+
+
+class GeneratedTuringMachine(CompiledTuringMachine):
+    def execute(self, steps):
+        if self.recorders() or len(self.program.states) > MAX_STATES:
+            return super().execute(steps)
+        _, runner, reach = generate_runner(self.program)
+        tape = self.tape
+        done = 0
+        while True:
+            origin = tape.origin
+            n, head, state, max_right, min_left, status = runner(
+                tape.buffer,
+                self.head_position + origin,
+                self.state_id,
+                self.max_right + origin,
+                self.min_left + origin,
+                steps - done,
+            )
+            self.head_position, self.state_id = head - origin, state
+            self.max_right, self.min_left = max_right - origin, min_left - origin
+            done += n
+            if status == DONE:
+                break
+            if status == HALT:
+                self.step_count += done
+                self.store()
+                raise NoTransitionError(
+                    f"No transition defined for the current configuration {self.configuration}"
+                )
+            tape.reserve(
+                self.head_position - reach, self.head_position + reach + 1
+            )
+        self.step_count += done
+        return False
+
+
+# Test Cases
+
+
+def test_generated_sqrt2_machine():
+    import time
+
+    try:
+        from turing_machine.op_extend import create_sqrt2_table
+        from turing_machine.compiled import assert_same_machine
+    except:
+        from op_extend import create_sqrt2_table
+        from compiled import assert_same_machine
+
+    table = create_sqrt2_table()
+    ctm = CompiledTuringMachine(table, "begin")
+    ctm.set_history_policy("off")
+    start = time.time()
+    ctm.run(steps=2000000)
+    compiled = time.time() - start
+
+    gtm = GeneratedTuringMachine(table, "begin")
+    gtm.set_history_policy("off")
+    start = time.time()
+    gtm.run(steps=2000000)
+    generated = time.time() - start
+    assert_same_machine(ctm, gtm)
+    assert ctm.step_count == gtm.step_count
+    print(gtm.get_binary()[:20])
+    print(f"compiled: {compiled:.3f}s, generated: {generated:.3f}s")
+
+    gtm = GeneratedTuringMachine(table, "begin")
+    gtm.run(steps=1000)
+    ctm = CompiledTuringMachine(table, "begin")
+    ctm.run(steps=1000)
+    assert_same_machine(ctm, gtm)
+    assert ctm.history == gtm.history
+    assert len(table.generated) == 1, "the runner is generated once per table"
+    source = next(iter(table.generated.values()))[0]
+    print(f"{len(source.splitlines())} lines of generated source")
+
+
+def test_generated_halting_machine():
+    try:
+        from turing_machine.op_extend import create_loop_tables
+        from turing_machine.compiled import assert_same_machine
+    except:
+        from op_extend import create_loop_tables
+        from compiled import assert_same_machine
+
+    # a rule which neither writes nor moves and keeps its m-configuration
+    tables = create_loop_tables()
+    for operations in [[], ["N"]]:
+        table = Table()
+        table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+        table.add_rule(TransitionRule("c", "_", operations, "c"))
+        tables.append(table)
+
+    for table, start in zip(tables, ["a", "b", "b", "b", "b"]):
+        for steps in [1, 7, 100]:
+            gtm = GeneratedTuringMachine(table, start)
+            gtm.set_history_policy("off")
+            ctm = CompiledTuringMachine(table, start)
+            ctm.set_history_policy("off")
+            for tm in [gtm, ctm]:
+                try:
+                    tm.run(steps=steps)
+                except NoTransitionError:
+                    pass
+            assert_same_machine(ctm, gtm)
+            assert ctm.step_count == gtm.step_count
+
+
+def test_generated_large_table():
+    try:
+        from turing_machine.compiled import assert_same_machine
+    except:
+        from compiled import assert_same_machine
+
+    table = Table()
+    for i in range(MAX_STATES + 1):
+        next_m_config = f"q{(i + 1) % (MAX_STATES + 1)}"
+        table.add_rule(TransitionRule(f"q{i}", "_", ["0", "R"], next_m_config))
+        table.add_rule(TransitionRule(f"q{i}", "0", ["1", "L", "L"], next_m_config))
+    gtm = GeneratedTuringMachine(table, "q0")
+    gtm.set_history_policy("off")
+    gtm.run(steps=1000)
+    ctm = CompiledTuringMachine(table, "q0")
+    ctm.set_history_policy("off")
+    ctm.run(steps=1000)
+    assert_same_machine(ctm, gtm)
+    assert table.generated == {}, "a large table runs on the compiled engine"
+
+
+if __name__ == "__main__":
+    test_generated_sqrt2_machine()
+    test_generated_halting_machine()
+    test_generated_large_table()
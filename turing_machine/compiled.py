@@ -0,0 +1,606 @@
+"""
+A compiled execution engine for the Turing machines in "op_extend.py".
+
+The interpreter in op_extend.TuringMachine looks up (m-configuration, symbol) in a dict
+(twice when it falls back to "*") and walks the operation list on every step.
+Here the table is compiled once before running:
+
+- every m-configuration and every symbol gets a dense integer id, "_" (blank) is always 0;
+- every m-configuration owns a list indexed by symbol id, the "*" rule fills the missing symbols;
+- every operation list is pre-decoded into a program: the writes relative to the head,
+  the net move of the head and the next m-configuration id;
+- the tape is a ByteTape (tape.py), a bytearray of symbol ids.
+
+So one step is two index operations and a few additions,
+and the machine ends with exactly the same tape, head and m-configuration as the interpreter.
+
+Scan loops, e.g. `Find`, `FindRight1`, `EraseAllMark` and `PrintEnd1` in abbreviated.py,
+are m-configurations whose "*" rule only moves the head and goes back to itself.
+They are detected when the table is compiled, and executed as one strided search over the tape:
+the head jumps to the first symbol that stops the loop and the skipped steps are still counted,
+so `steps` and `verbose` keep their meaning.
+The recorders get one record_sweep event for the whole scan, a recorder which stops the run
+inside it (e.g. the cycle detector) returns the number of steps it consumed instead of True,
+the engine stops after these steps.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+try:
+    from turing_machine.op_extend import (
+        Table,
+        TransitionRule,
+        TuringMachine,
+        NoTransitionError,
+    )
+    from turing_machine.tape import SymbolTable
+except:
+    from op_extend import Table, TransitionRule, TuringMachine, NoTransitionError
+    from tape import SymbolTable
+
+
+BLANK = "_"
+
+
+class CompiledTable:
+    """
+    Dense integer form of a Table
+
+    rows[state_id][symbol_id] is None when no transition is defined, otherwise a program:
+    (writes, move, lo, hi, next_state_id, stop)
+
+    - writes: ((offset, symbol_id), ...) in the order of the operations
+    - move: the net move of the head
+    - lo, hi: the leftmost and rightmost offsets the head visits
+    - stop: None, or a 256 bytes table marking the symbols which stop the scan loop of this program
+    """
+
+    def __init__(self, table: Table, symbol_table: SymbolTable = None):
+        """
+        symbol_table: shared with the tape, so the codes on the tape are the symbol ids
+        """
+        self.table = table
+        self.symbol_table = symbol_table or SymbolTable(BLANK)
+        assert self.symbol_table.symbols[0] == BLANK
+        self.symbols = self.symbol_table.symbols
+        self.symbol_ids = self.symbol_table.codes
+        self.states = []
+        self.state_ids = {}
+        self.defaults = []
+        self.rows = []
+
+        rules = table.table.items() if table else []
+        for (m_config, symbol), (operations, next_m_config) in rules:
+            self.intern_state(m_config)
+            self.intern_state(next_m_config)
+            if symbol != "*":
+                self.symbol_table.intern(symbol)
+            for operation in operations:
+                if operation not in ("L", "R", "N"):
+                    self.symbol_table.intern(operation)
+
+        for (m_config, symbol), (operations, next_m_config) in rules:
+            if symbol == "*":
+                state_id = self.state_ids[m_config]
+                self.defaults[state_id] = self.compile_operations(
+                    operations, next_m_config
+                )
+        for state_id, default in enumerate(self.defaults):
+            self.rows[state_id] = [default] * len(self.symbols)
+        for (m_config, symbol), (operations, next_m_config) in rules:
+            if symbol != "*":
+                state_id = self.state_ids[m_config]
+                self.rows[state_id][self.symbol_ids[symbol]] = (
+                    self.compile_operations(operations, next_m_config)
+                )
+        for state_id in range(len(self.states)):
+            self.detect_scan_loop(state_id)
+
+    def intern_state(self, m_config):
+        if m_config not in self.state_ids:
+            self.state_ids[m_config] = len(self.states)
+            self.states.append(m_config)
+            self.defaults.append(None)
+            self.rows.append([None] * len(self.symbols))
+        return self.state_ids[m_config]
+
+    def intern_symbol(self, symbol):
+        code = self.symbol_table.intern(symbol)
+        self.sync()
+        return code
+
+    def sync(self):
+        """
+        symbols only found on the tape (e.g. loaded instructions) are matched by "*"
+        """
+        for state_id, row in enumerate(self.rows):
+            while len(row) < len(self.symbols):
+                row.append(self.defaults[state_id])
+
+    def compile_operations(self, operations, next_m_config):
+        writes = []
+        offset = lo = hi = 0
+        for operation in operations:
+            if operation == "R":
+                offset += 1
+                hi = max(hi, offset)
+            elif operation == "L":
+                offset -= 1
+                lo = min(lo, offset)
+            elif operation != "N":
+                writes.append((offset, self.symbol_ids[operation]))
+        return (
+            tuple(writes),
+            offset,
+            lo,
+            hi,
+            self.state_ids[next_m_config],
+            None,
+        )
+
+    def is_move_loop(self, program, state_id, move):
+        """the program only moves the head in one direction and goes back to state_id"""
+        if program is None:
+            return False
+        writes, program_move, lo, hi, next_state, _ = program
+        if writes or program_move != move or next_state != state_id:
+            return False
+        return (lo, hi) == ((0, move) if move > 0 else (move, 0))
+
+    def detect_scan_loop(self, state_id):
+        """
+        A scan loop: the "*" rule moves the head and goes back to the same m-configuration.
+        The scanned symbols with another behavior stop the loop.
+        """
+        default = self.defaults[state_id]
+        if default is None or default[1] == 0:
+            return
+        if not self.is_move_loop(default, state_id, default[1]):
+            return
+        stop = bytearray(256)
+        row = self.rows[state_id]
+        loop = default[:5] + (stop,)
+        for symbol_id, program in enumerate(row):
+            if self.is_move_loop(program, state_id, default[1]):
+                row[symbol_id] = loop
+            else:
+                stop[symbol_id] = 1
+        self.defaults[state_id] = loop
+
+
+def scan(tape: bytearray, head, move, stop, limit):
+    """
+    Count the steps of a scan loop: the head reads tape[head], tape[head + move], ...
+    until it finds a symbol marked in `stop`, at most `limit` steps.
+    The squares on both sides of the bytearray are blank (symbol id 0).
+    """
+    end = head + limit * move
+    bound = min(end, len(tape)) if move > 0 else max(end, -1)
+
+    pos = head
+    window = 64 * move
+    while (pos < bound) if move > 0 else (pos > bound):
+        if move > 0:
+            chunk = tape[pos : min(pos + window, bound) : move]
+        else:
+            chunk_end = max(pos + window, bound)
+            chunk = tape[pos : chunk_end if chunk_end >= 0 else None : move]
+        found = chunk.translate(stop).find(1)
+        if found >= 0:
+            return (pos - head) // move + found
+        pos += len(chunk) * move
+        window *= 2
+
+    if pos == end or not stop[0]:
+        return limit
+    return (pos - head) // move
+
+
+class CompiledTuringMachine(TuringMachine):
+    """
+    Same interface as op_extend.TuringMachine, `run` executes the compiled table.
+
+    The tape is always a ByteTape, the engine runs on its bytearray
+    and the symbol table is shared with the compiled table.
+    The history is recorded with the same policy as the interpreter,
+    use set_history_policy("off") for the fastest loop.
+    """
+
+    def __init__(self, table, initial_state):
+        super().__init__(table, initial_state, compact=True)
+        self.program = None
+
+    def compile(self):
+        if (
+            self.program is None
+            or self.program.table is not self.table
+            or self.program.symbol_table is not self.tape.symbols
+        ):
+            self.program = CompiledTable(self.table, self.tape.symbols)
+        self.program.sync()
+        return self.program
+
+    def run(self, steps=1000, verbose=False):
+        program = self.compile()
+        self.state_id = program.intern_state(self.current_state)
+        try:
+            if verbose == True:
+                stops = range(steps)
+            elif verbose:
+                stops = sorted(i for i in verbose if 0 <= i < steps)
+            else:
+                stops = []
+            done = 0
+            for idx in stops:
+                if self.execute(idx - done) or self.execute(1):
+                    return
+                done = idx + 1
+                self.store()
+                print(f"{idx + 1}: {self.str(turing=False)}")
+            self.execute(steps - done)
+        except BaseException:
+            # write the trailer, a trace without it cannot be read back, see tracer.py
+            self.stop_trace()
+            raise
+        finally:
+            self.store()
+
+    def store(self):
+        """write the compiled state back to the interpreter fields"""
+        self.current_state = self.program.states[self.state_id]
+
+    def execute(self, steps):
+        """
+        return True if an observer asks to stop the run
+        """
+        rows = self.program.rows
+        symbols = self.program.symbols
+        states = self.program.states
+        record, record_sweep = self.compile_recorders()
+        tape = self.tape.buffer
+        size = len(tape)
+        origin = self.tape.origin
+        head = self.head_position + origin
+        state = self.state_id
+        max_right = self.max_right + origin
+        min_left = self.min_left + origin
+
+        n = 0
+        halted = stopped = False
+        while n < steps:
+            program = rows[state][tape[head]]
+            if program is None:
+                halted = True
+                break
+            writes, move, lo, hi, next_state, stop = program
+            if stop is not None:
+                count = scan(tape, head, move, stop, steps - n)
+                if record is not None:
+                    consumed = record_sweep(
+                        count,
+                        move,
+                        head - origin,
+                        states[state],
+                        max_right - origin,
+                        min_left - origin,
+                    )
+                    if consumed is not False and consumed is not None:
+                        stopped = True
+                        if consumed is not True:
+                            count = consumed
+                head += count * move
+                n += count
+                lo = hi = 0
+            if head + hi >= size:
+                tape = self.tape.grow(0, max(size, head + hi - size + 1))
+                size = len(tape)
+            if head + lo < 0:
+                grow = max(size, -(head + lo))
+                tape = self.tape.grow(grow, 0)
+                size += grow
+                origin += grow
+                head += grow
+                max_right += grow
+                min_left += grow
+            if head + hi > max_right:
+                max_right = head + hi
+            if head + lo < min_left:
+                min_left = head + lo
+            if stopped:
+                break
+            if stop is not None:
+                continue
+
+            if record is None:
+                for offset, code in writes:
+                    tape[head + offset] = code
+            else:
+                changes = []
+                for offset, code in writes:
+                    position = head + offset
+                    changes.append(
+                        (position - origin, symbols[tape[position]], symbols[code])
+                    )
+                    tape[position] = code
+            head += move
+            state = next_state
+            n += 1
+            if record is not None and record(
+                changes,
+                head - origin,
+                states[state],
+                max_right - origin,
+                min_left - origin,
+            ):
+                stopped = True
+                break
+
+        self.tape.origin = origin
+        self.head_position, self.state_id = head - origin, state
+        self.max_right, self.min_left = max_right - origin, min_left - origin
+        self.step_count += n
+        if halted:
+            self.store()
+            raise NoTransitionError(
+                f"No transition defined for the current configuration {self.configuration}"
+            )
+        return stopped
+
+    def compile_recorders(self):
+        """one function for the step events and one for the sweeps, None if nobody records"""
+        recorders = self.recorders()
+        if not recorders:
+            return None, None
+        if len(recorders) == 1:
+            return recorders[0].record, recorders[0].record_sweep
+
+        def record(*event):
+            stop = False
+            for recorder in recorders:
+                stop = recorder.record(*event) or stop
+            return stop
+
+        # the recorders which may stop inside a sweep go first, the others get the steps they consumed
+        sweep_recorders = sorted(
+            recorders, key=lambda recorder: not getattr(recorder, "partial_sweeps", False)
+        )
+
+        def record_sweep(count, *event):
+            stop = partial = False
+            for recorder in sweep_recorders:
+                consumed = recorder.record_sweep(count, *event)
+                if consumed is True:
+                    stop = True
+                elif consumed is not False and consumed is not None:
+                    partial = True
+                    count = consumed
+            return count if partial else stop
+
+        return record, record_sweep
+
+
+# Test Cases
+
+
+def assert_same_machine(tm, ctm):
+    assert tm.get_tape() == ctm.get_tape(), (tm.get_tape(), ctm.get_tape())
+    assert tm.head_position == ctm.head_position
+    assert tm.m_configuration == ctm.m_configuration
+    assert tm.max_right == ctm.max_right
+    assert tm.min_left == ctm.min_left
+
+
+def test_compiled_transcendental_machine():
+    print("compare compiled and interpreted transcendental machine")
+    table = Table()
+    description = [
+        ("b", "_", ["$", "R", "$", "R", "0", "R", "R", "0", "L", "L"], "o"),
+        ("o", "1", ["R", "x", "L", "L", "L"], "o"),
+        ("o", "0", [], "q"),
+        ("q", "*", ["R", "R"], "q"),
+        ("q", "_", ["1", "L"], "p"),
+        ("p", "x", ["_", "R"], "q"),
+        ("p", "$", ["R"], "f"),
+        ("p", "_", ["L", "L"], "p"),
+        ("f", "*", ["R", "R"], "f"),
+        ("f", "_", ["0", "L", "L"], "o"),
+    ]
+    for rule in description:
+        table.add_rule(TransitionRule(*rule))
+
+    tm = TuringMachine(table, "b")
+    tm.run(steps=3000)
+    ctm = CompiledTuringMachine(table, "b")
+    ctm.run(steps=1000, verbose=range(995, 1000))
+    ctm.run(steps=2000)
+    assert_same_machine(tm, ctm)
+    assert tm.history == ctm.history
+    print(ctm.get_sequence())
+
+
+def test_compiled_left_of_zero():
+    print("the tape is infinite in both directions")
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["R", "L", "L", "x", "R"], "c"))
+    table.add_rule(TransitionRule("c", "*", ["L", "L", "y"], "b"))
+    tm = TuringMachine(table, "b")
+    tm.run(steps=2)
+    ctm = CompiledTuringMachine(table, "b")
+    ctm.run(steps=2)
+    assert_same_machine(tm, ctm)
+    assert tm.history == ctm.history
+
+    try:
+        ctm.run(steps=1)
+    except Exception as e:
+        print(e)
+    assert ctm.get_tape() == ["y", "x", "_", "_"], ctm.get_tape()
+    assert ctm.head_position == -2
+    assert ctm.m_configuration == "b"
+
+    # a scan loop to the left of 0, the history keeps the left end of every step
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["x", "R", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["y", "L"], "d"))
+    table.add_rule(TransitionRule("d", "*", ["L"], "d"))
+    tm = TuringMachine(table, "b")
+    tm.run(steps=8)
+    ctm = CompiledTuringMachine(table, "b")
+    ctm.run(steps=8)
+    assert_same_machine(tm, ctm)
+    assert tm.history == ctm.history
+
+
+def test_compiled_scan_loops():
+    print("scan loops: stop symbols and the blanks on both sides")
+    table = Table()
+    description = [
+        ("b", "_", ["$", "R", "$", "R", "0", "R", "x", "R", "1", "L", "L", "L"], "r"),
+        ("r", "*", ["R", "R"], "r"),
+        ("r", "x", ["L"], "l"),
+        ("l", "$", ["R", "y"], "r2"),
+        ("l", "*", ["L"], "l"),
+        ("r2", "*", ["R"], "r2"),
+    ]
+    for rule in description:
+        table.add_rule(TransitionRule(*rule))
+
+    for steps in [1, 2, 5, 9, 10, 11, 40, 200]:
+        tm = TuringMachine(table, "b")
+        tm.run(steps=steps)
+        ctm = CompiledTuringMachine(table, "b")
+        ctm.run(steps=steps)
+        assert_same_machine(tm, ctm)
+        assert tm.history == ctm.history
+
+    ctm = CompiledTuringMachine(table, "b")
+    ctm.set_history_policy("ring", 3)
+    ctm.run(steps=200, verbose=[20, 21])
+    assert ctm.history == tm.history[-3:]
+
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["R", "R", "R", "x"], "l"))
+    table.add_rule(TransitionRule("l", "*", ["L", "L"], "l"))
+    tm = TuringMachine(table, "b")
+    tm.run(steps=60)
+    ctm = CompiledTuringMachine(table, "b")
+    ctm.run(steps=60)
+    assert_same_machine(tm, ctm)
+    assert tm.history == ctm.history
+
+
+def test_compiled_sqrt2_machine():
+    import time
+
+    try:
+        from turing_machine.op_extend import create_sqrt2_table
+    except:
+        from op_extend import create_sqrt2_table
+
+    print("compare compiled and interpreted sqrt(2) machine")
+    table = create_sqrt2_table()
+    steps = 100000
+
+    start = time.time()
+    tm = TuringMachine(table, "begin")
+    tm.set_history_policy("off")
+    tm.run(steps=steps)
+    interpreted = time.time() - start
+
+    start = time.time()
+    ctm = CompiledTuringMachine(table, "begin")
+    ctm.set_history_policy("off")
+    ctm.run(steps=steps)
+    compiled = time.time() - start
+
+    assert_same_machine(tm, ctm)
+    print(ctm.get_sequence())
+    print(f"interpreter: {interpreted:.3f}s, compiled: {compiled:.3f}s")
+
+
+def test_compiled_universal_machine():
+    import time
+
+    try:
+        from turing_machine.encoding import Assembler
+        from turing_machine.universal import create_universal_machine
+    except:
+        from encoding import Assembler
+        from universal import create_universal_machine
+
+    print("compare compiled and interpreted universal machine")
+    bcek_table = Table()
+    bcek_table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    bcek_table.add_rule(TransitionRule("c", "_", ["1", "R"], "b"))
+    encoder = Assembler(bcek_table, {"0", "1", "$"}, {"_", "x"})
+    total = 50699
+
+    tm = create_universal_machine(encoder.standard_description)
+    tm.set_history_policy("off")
+    start = time.time()
+    tm.run(steps=total)
+    interpreted = time.time() - start
+
+    ctm = create_universal_machine(encoder.standard_description, compiled=True)
+    ctm.set_history_policy("off")
+    start = time.time()
+    ctm.run(steps=total)
+    compiled = time.time() - start
+
+    assert_same_machine(tm, ctm)
+    print(ctm.get_sequence())
+    print(f"interpreter: {interpreted:.3f}s, compiled: {compiled:.3f}s")
+
+
+def test_compiled_run_until():
+    print("run until a cycle, halting or a predicate in both engines")
+    try:
+        from turing_machine.op_extend import create_loop_tables, create_sqrt2_table
+    except:
+        from op_extend import create_loop_tables, create_sqrt2_table
+
+    for table, start in zip(create_loop_tables(), ["a", "b", "b"]):
+        tm = TuringMachine(table, start)
+        ctm = CompiledTuringMachine(table, start)
+        assert tm.run_until(max_steps=100) == ctm.run_until(max_steps=100)
+        assert_same_machine(tm, ctm)
+        assert tm.history == ctm.history
+
+    # a machine bouncing between two marks with scan loops, the repetition is found inside a scan
+    table = Table()
+    for rule in [
+        ("b", "_", ["$", "R", "R", "R", "R", "R", "R", "R", "$", "L", "L"], "l"),
+        ("l", "*", ["L"], "l"),
+        ("l", "$", ["R"], "r"),
+        ("r", "*", ["R"], "r"),
+        ("r", "$", ["L"], "l"),
+    ]:
+        table.add_rule(TransitionRule(*rule))
+    tm = TuringMachine(table, "b")
+    ctm = CompiledTuringMachine(table, "b")
+    assert tm.run_until(detect_cycle=True) == ctm.run_until(detect_cycle=True)
+    assert_same_machine(tm, ctm)
+    assert tm.history == ctm.history
+
+    table = create_sqrt2_table()
+    tm = TuringMachine(table, "begin")
+    ctm = CompiledTuringMachine(table, "begin")
+    ctm.set_history_policy("off")
+    predicate = lambda tm: len(tm.get_sequence()) >= 8
+    reason, steps = ctm.run_until(predicate=predicate, check_every=1)
+    assert tm.run_until(predicate=predicate) == (reason, steps)
+    assert_same_machine(tm, ctm)
+    assert ctm.step_count == steps
+    print(f"{reason} after {steps} steps: {ctm.get_binary()}")
+
+
+if __name__ == "__main__":
+    test_compiled_transcendental_machine()
+    test_compiled_left_of_zero()
+    test_compiled_scan_loops()
+    test_compiled_sqrt2_machine()
+    test_compiled_run_until()
+    test_compiled_universal_machine()
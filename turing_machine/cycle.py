@@ -0,0 +1,100 @@
+"""
+Cheap detection of repeated complete configurations.
+
+A deterministic machine which repeats a complete configuration (m-configuration, head, tape)
+loops forever. Storing every configuration to find the repetition costs O(steps * tape) memory,
+so the detector only keeps:
+
+- a rolling hash of the tape: the sum of hash((position, symbol)) over the non-blank squares,
+  updated in O(1) for every write;
+- Brent's algorithm over the hashes of the complete configurations:
+  one saved configuration (the tortoise), moved to the current configuration
+  every time the number of steps since the last move reaches a power of two.
+
+A repetition is found at most about 2 * (steps before the cycle + period) steps after the loop starts.
+Equal 64-bit hashes are taken as equal configurations.
+
+The detector is an observer of the machine (see TuringMachine.observers),
+it receives the same step events as the history recorders (history.py).
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+MASK = (1 << 64) - 1
+
+
+def square_hash(position, symbol):
+    return hash((position, symbol)) & MASK
+
+
+class CycleDetector:
+    # record_sweep may stop the run inside a sweep, see compiled.py
+    partial_sweeps = True
+
+    def __init__(self, tm):
+        self.blank = tm.tape.blank
+        self.tape_hash = 0
+        for position, symbol in enumerate(tm.get_tape(), tm.min_left):
+            if symbol != self.blank:
+                self.tape_hash += square_hash(position, symbol)
+        self.tape_hash &= MASK
+        self.tortoise = (tm.current_state, tm.head_position, self.tape_hash)
+        self.power = 1
+        self.lam = 0
+        self.found = False
+        self.period = None
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        """return True when the configuration after this step is a repetition"""
+        for position, old, new in writes:
+            if old != self.blank:
+                self.tape_hash -= square_hash(position, old)
+            if new != self.blank:
+                self.tape_hash += square_hash(position, new)
+        self.tape_hash &= MASK
+        return self.visit(m_config, head, 1) > 0
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        """
+        `count` steps only moving the head: the tape hash and m-configuration do not change,
+        the tortoise can only match one of them
+
+        return the number of steps up to the repetition when one is found, the engine stops there
+        """
+        done = 0
+        while done < count:
+            segment = min(count - done, self.power - self.lam)
+            i = self.visit(m_config, head + done * move, segment, move)
+            if i:
+                return done + i
+            done += segment
+        return False
+
+    def visit(self, m_config, head, count, move=0):
+        """
+        the configurations (m_config, head + i * move, tape) for i in 1..count,
+        the tortoise is not moved before the last one,
+        return i when the configuration i is the repetition, 0 otherwise
+        """
+        tortoise_m_config, tortoise_head, tortoise_hash = self.tortoise
+        if tortoise_m_config == m_config and tortoise_hash == self.tape_hash:
+            if move == 0:
+                i = count if tortoise_head == head else 0
+            elif (tortoise_head - head) % move == 0:
+                i = (tortoise_head - head) // move
+            else:
+                i = 0
+            if 1 <= i <= count:
+                self.found = True
+                self.period = self.lam + i
+                return i
+
+        self.lam += count
+        if self.lam == self.power:
+            self.tortoise = (m_config, head + count * move, self.tape_hash)
+            self.power *= 2
+            self.lam = 0
+        return 0
@@ -24,6 +24,8 @@ Email: metaescape@foxmail.com
 License: MIT License
 """
 
+from functools import cached_property
+
 try:
     from turing_machine.op_extend import Table, TransitionRule, TuringMachine
     from turing_machine.abbreviated import (
@@ -49,7 +51,11 @@ class Assembler:
         self.figure_vocab = figure_vocab
         self.erase_vocab = erase_vocab
         self.vocab = figure_vocab | erase_vocab
+        # iterate the symbols in a fixed order, the encoding is the same in every process
+        self.symbols = sorted(self.vocab)
         self.std_map = self.build_symbol_map()
+        # (operations, next m-configuration) -> m-configuration, see expand_suffix
+        self.suffix_m_configs = {}
         self.q_cnt = self.get_max_m_config_number()
         self.symbol_expanded_table = self.expand_regex_in_table(table.table)
         self.m_config_std_table = self.standardize_m_configuration(
@@ -68,7 +74,7 @@ class Assembler:
             "x": "DCCCC",
         }
         cnt = 5
-        for symbol in self.vocab:
+        for symbol in self.symbols:
             if symbol not in std_code_map:
                 std_code_map[symbol] = "D" + cnt * "C"
                 cnt += 1
@@ -89,7 +95,7 @@ class Assembler:
         """
         rules = []
         assert "*" in rule.symbols
-        for symbol in self.vocab:
+        for symbol in self.symbols:
             if (rule.m_config, symbol) not in self.origin_table.table:
                 new_rule = TransitionRule(
                     rule.m_config, symbol, rule.operations, rule.next_m_config
@@ -188,66 +194,52 @@ class Assembler:
                     )
                 ]
 
-            self.q_cnt += 1
-            new_m_config = f"q{self.q_cnt + 1}"
+            new_m_config, seconds = self.expand_suffix(
+                operations[2:], rule.next_m_config
+            )
             first_rule = TransitionRule(
                 rule.m_config, rule.symbols, operations[:2], new_m_config
             )
-            seconds = []
-            for symbol in self.vocab:
-                seconds.append(
-                    TransitionRule(
-                        new_m_config,
-                        symbol,
-                        operations[2:],
-                        rule.next_m_config,
-                    )
-                )
-            return [first_rule] + sum(
-                [self.expand_operations(r) for r in seconds], []
-            )
+            return [first_rule] + seconds
         elif operations[0] not in ["L", "R", "N"]:
-            self.q_cnt += 1
-            new_m_config = f"q{self.q_cnt + 1}"
+            new_m_config, seconds = self.expand_suffix(
+                operations[1:], rule.next_m_config
+            )
             first_rule = TransitionRule(
                 rule.m_config, rule.symbols, [operations[0], "N"], new_m_config
             )
-            seconds = []
-            for symbol in self.vocab:
-                seconds.append(
-                    TransitionRule(
-                        new_m_config,
-                        symbol,
-                        operations[1:],
-                        rule.next_m_config,
-                    )
-                )
-            return [first_rule] + sum(
-                [self.expand_operations(r) for r in seconds], []
-            )
+            return [first_rule] + seconds
 
         else:  # operations[0] in ["L", "R", "N"]:
-            self.q_cnt += 1
-            new_m_config = f"q{self.q_cnt + 1}"
+            new_m_config, seconds = self.expand_suffix(
+                operations[1:], rule.next_m_config
+            )
             first_rule = TransitionRule(
                 rule.m_config,
                 rule.symbols,
                 [operations[0]],
                 new_m_config,
             )
-            seconds = []
-            for symbol in self.vocab:
-                seconds.append(
-                    TransitionRule(
-                        new_m_config,
-                        symbol,
-                        operations[1:],
-                        rule.next_m_config,
-                    )
-                )
-            return self.expand_operations(first_rule) + sum(
-                [self.expand_operations(r) for r in seconds], []
-            )
+            return self.expand_operations(first_rule) + seconds
+
+    def expand_suffix(self, operations: list, next_m_config: str):
+        """
+        The m-configuration which does the operations then goes to next_m_config,
+        with its 5-tuple rules (one for every symbol, which may be printed back before a move).
+        It is created once for every (operations, next_m_config) and shared by every rule
+        ending with these operations, so a rule of n operations adds at most n m-configurations
+        """
+        key = (tuple(operations), next_m_config)
+        if key in self.suffix_m_configs:
+            return self.suffix_m_configs[key], []
+        self.q_cnt += 1
+        new_m_config = f"q{self.q_cnt + 1}"
+        self.suffix_m_configs[key] = new_m_config
+        rules = []
+        for symbol in self.symbols:
+            rule = TransitionRule(new_m_config, symbol, operations, next_m_config)
+            rules.extend(self.expand_operations(rule))
+        return new_m_config, rules
 
     def encode_rule_to_5_tuple(self, table: Table):
         """
@@ -262,7 +254,7 @@ class Assembler:
 
         return new_table
 
-    @property
+    @cached_property
     def standard_description(self):
         """
         Encode the transition table into standard description
@@ -278,7 +270,7 @@ class Assembler:
 
         return "".join(codes)
 
-    @property
+    @cached_property
     def standard_form(self):
         """
         Encode the transition table into 5-tuple standard form
@@ -290,7 +282,7 @@ class Assembler:
             codes.append((m_config, symbol, print, move, next_m_config))
         return codes
 
-    @property
+    @cached_property
     def description_number(self):
         """
         Encode the transition table into the description number
@@ -341,6 +333,93 @@ class Assembler:
             result.append(":")
         return "".join(result)
 
+    def stream_history(self, tm, out):
+        """
+        write encode_history(tm.history) to `out` while tm runs, see HistoryStream
+        """
+        stream = HistoryStream(self, tm, out)
+        tm.observers.append(stream)
+        return stream
+
+
+class HistoryStream:
+    """
+    An observer of a Turing machine which writes the standard encoding of every new
+    complete configuration to a file or a buffer, the same string as Assembler.encode_history.
+
+    The encoded squares of the tape are kept in a list, a step only re-encodes the squares it writes
+    (and the blanks it reaches), the history is never stored.
+    """
+
+    def __init__(self, assembler: Assembler, tm, out):
+        """
+        out: a path or an object with a write method (a file, io.StringIO, ...)
+        """
+        self.assembler = assembler
+        self.tm = tm
+        self.owned = isinstance(out, str)
+        self.out = open(out, "w") if self.owned else out
+        self.blank = assembler.encode_symbol("_")
+        self.m_config_codes = {}
+        self.left = tm.min_left
+        self.codes = [assembler.encode_symbol(symbol) for symbol in tm.get_tape()]
+        self.configurations = 0
+        self.out.write(":")
+
+    def m_config_code(self, m_config):
+        code = self.m_config_codes.get(m_config)
+        if code is None:
+            code = self.m_config_codes[m_config] = self.assembler.encode_m_config(m_config)
+        return code
+
+    def reach(self, position):
+        """extend the encoded tape with blanks up to position"""
+        if position < self.left:
+            self.codes[:0] = [self.blank] * (self.left - position)
+            self.left = position
+        end = position - self.left + 1
+        if end > len(self.codes):
+            self.codes.extend([self.blank] * (end - len(self.codes)))
+
+    def write(self, head, m_config, max_right, min_left):
+        head -= self.left
+        codes = self.codes
+        self.out.write(
+            "".join(codes[min_left - self.left : head])
+            + self.m_config_code(m_config)
+            + "".join(codes[head : max_right - self.left + 1])
+            + ":"
+        )
+        self.configurations += 1
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        encode = self.assembler.encode_symbol
+        for position, _, symbol in writes:
+            self.reach(position)
+            self.codes[position - self.left] = encode(symbol)
+        self.reach(min_left)
+        self.reach(max_right)
+        self.write(head, m_config, max_right, min_left)
+        return False
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        for i in range(1, count + 1):
+            position = head + i * move
+            right = max(max_right, position)
+            left = min(min_left, position)
+            self.reach(left)
+            self.reach(right)
+            self.write(position, m_config, right, left)
+        return False
+
+    def close(self):
+        if self in self.tm.observers:
+            self.tm.observers.remove(self)
+        if self.owned:
+            self.out.close()
+        else:
+            self.out.flush()
+
 
 # Test Cases
 
@@ -427,8 +506,16 @@ def test_expand_operations():
     pprint(encoder.expand_operations(rule))
     rule = TransitionRule(
         "b", "_", ["$", "R", "$", "R", "0", "R", "R", "0", "L", "L"], "o"
-    )  # exponential expansion, so it's not recommended to write a rule with too many operations
+    )
     pprint(len(encoder.expand_operations(rule)))
+    # the suffixes are shared, the expansion grows linearly with the number of operations
+    sizes = []
+    for n in [10, 20, 40]:
+        rule = TransitionRule("b", "_", ["0", "R", "R"] * n, "o")
+        encoder = Assembler(table, {"0", "1", "$"}, {"_", "x"})
+        sizes.append(len(encoder.expand_operations(rule)))
+    pprint(sizes)
+    assert sizes[2] - sizes[1] == 2 * (sizes[1] - sizes[0])
 
 
 def test_std_form_table_standard_encoding():
@@ -458,6 +545,65 @@ def test_std_form_table_standard_encoding():
     pprint(encoder.description_number)
 
 
+def test_stream_history():
+    import io
+    import time
+
+    try:
+        from turing_machine.compiled import CompiledTuringMachine
+    except:
+        from compiled import CompiledTuringMachine
+
+    print("stream the encoded complete configurations while the machine runs")
+    table = Table()
+    description = [
+        ("q1", "_", ["$", "R", "$", "R", "0", "R", "x", "R", "1", "L", "L", "L"], "q2"),
+        ("q2", "*", ["R", "R"], "q2"),
+        ("q2", "x", ["L"], "q3"),
+        ("q3", "$", ["R", "y"], "q4"),
+        ("q3", "*", ["L"], "q3"),
+        ("q4", "*", ["R"], "q4"),
+    ]
+    for rule in description:
+        table.add_rule(TransitionRule(*rule))
+    encoder = Assembler(table, {"0", "1", "$"}, {"_", "x", "y"})
+
+    # the compiled engine reports the scan loops of q2, q3 and q4 as sweeps
+    for machine in [TuringMachine, CompiledTuringMachine]:
+        tm = machine(table, "q1")
+        out = io.StringIO()
+        stream = encoder.stream_history(tm, out)
+        tm.run(steps=40)
+        stream.close()
+        assert out.getvalue() == encoder.encode_history(tm.history)
+        assert stream.configurations == 40
+    print(out.getvalue()[:120])
+
+    bcek_table = Table()
+    bcek_table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    bcek_table.add_rule(TransitionRule("c", "_", ["1", "R"], "b"))
+    encoder = Assembler(bcek_table, {"0", "1", "$"}, {"_", "x"})
+    timings = []
+    for steps in [1000, 2000]:
+        tm = TuringMachine(encoder.std_form_table, encoder.get_inner_m_config("b"))
+        start = time.perf_counter()
+        tm.run(steps=steps)
+        batch = encoder.encode_history(tm.history)
+        batch_time = time.perf_counter() - start
+
+        tm = TuringMachine(encoder.std_form_table, encoder.get_inner_m_config("b"))
+        tm.set_history_policy("off")
+        out = io.StringIO()
+        start = time.perf_counter()
+        stream = encoder.stream_history(tm, out)
+        tm.run(steps=steps)
+        stream.close()
+        timings.append((steps, batch_time, time.perf_counter() - start))
+        assert out.getvalue() == batch
+    for steps, batch_time, stream_time in timings:
+        print(f"{steps} steps: history then encode {batch_time:.3f}s, stream {stream_time:.3f}s")
+
+
 if __name__ == "__main__":
     test_max_m_config_number()
     test_expand_any_regex_symbol()
@@ -465,3 +611,4 @@ if __name__ == "__main__":
     test_m_config_name_normalize()
     test_expand_operations()
     test_std_form_table_standard_encoding()
+    test_stream_history()
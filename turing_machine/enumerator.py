@@ -0,0 +1,142 @@
+"""
+Run the machines of a range of description numbers, the inverse of Assembler.description_number.
+
+A description number is the standard description with
+A, C, D, L, R, N, ; written as 1, 2, 3, 4, 5, 6, 7.
+A number is well-formed when it is a sequence of rules
+
+    ; D A^i  D C^j  D C^k  L|R|N  D A^l      (qi, Sj) -> print Sk, move, ql
+
+and no two rules have the same (m-configuration, symbol).
+S0, S1, S2, S3, S4 are "_", "0", "1", "$", "x" as in Assembler, the other symbols are named "S5", "S6", ...
+The machine starts in q1.
+
+The numbers are cut into chunks, each chunk is decoded and run in one process of a pool,
+and the results are streamed to a file as json lines, in the order of the numbers:
+
+    {"number": ..., "outcome": "halted" | "cycle" | "max_steps", "steps": ..., "figures": ...}
+
+see TuringMachine.run_until for the outcomes, figures are the figures printed on the F-squares.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+import json
+from collections import Counter
+from multiprocessing import Pool
+
+try:
+    from turing_machine.op_extend import Table, TransitionRule, TuringMachine
+    from turing_machine.compiled import CompiledTuringMachine
+    from turing_machine.codec import decode
+except:
+    from op_extend import Table, TransitionRule, TuringMachine
+    from compiled import CompiledTuringMachine
+    from codec import decode
+
+
+def decode_description_number(number):
+    """
+    return the table of a description number, None if it is not well-formed, see codec.decode
+    """
+    return decode(number)
+
+
+def run_machine(table, steps, compiled=True, figures=64):
+    machine = CompiledTuringMachine if compiled else TuringMachine
+    tm = machine(table, "q1")
+    tm.set_history_policy("off")
+    outcome, steps = tm.run_until(max_steps=steps)
+    return {
+        "outcome": outcome,
+        "steps": steps,
+        "figures": tm.get_sequence()[:figures],
+    }
+
+
+def run_chunk(task):
+    """the results of the well-formed numbers in [start, stop)"""
+    start, stop, steps, compiled = task
+    results = []
+    for number in range(start, stop):
+        table = decode_description_number(number)
+        if table is None:
+            continue
+        result = {"number": number}
+        result.update(run_machine(table, steps, compiled))
+        results.append(result)
+    return results
+
+
+def enumerate_machines(
+    start, stop, path, steps=1000, processes=None, chunk=10000, compiled=True
+):
+    """
+    run the machines of the description numbers in [start, stop) for at most `steps` steps,
+    write the results to `path` and return the number of machines of each outcome
+    """
+    tasks = (
+        (begin, min(begin + chunk, stop), steps, compiled)
+        for begin in range(start, stop, chunk)
+    )
+    outcomes = Counter()
+    with Pool(processes) as pool, open(path, "w") as f:
+        for results in pool.imap(run_chunk, tasks):
+            for result in results:
+                outcomes[result["outcome"]] += 1
+                f.write(json.dumps(result) + "\n")
+            f.flush()
+    return outcomes
+
+
+# Test Cases
+
+
+def test_decode_description_number():
+    try:
+        from turing_machine.encoding import Assembler
+    except:
+        from encoding import Assembler
+
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["_", "R"], "e"))
+    table.add_rule(TransitionRule("e", "_", ["1", "R"], "k"))
+    table.add_rule(TransitionRule("k", "_", ["_", "R"], "b"))
+    number = Assembler(table, {"0", "1"}, {"_"}).description_number
+    decoded = decode_description_number(number)
+    assert run_machine(decoded, 100)["figures"].startswith("0101")
+    print(f"{number}: {decoded.table}")
+
+    assert decode_description_number(31332531) is None, "a rule starts with ;"
+    assert decode_description_number(73133253117313325311) is None, "not deterministic"
+    assert decode_description_number(73133253117311332531) is not None
+    assert run_machine(decode_description_number(73133631), 100)["outcome"] == "cycle"
+
+
+def test_enumerate_machines():
+    import os
+    import tempfile
+
+    path = os.path.join(tempfile.mkdtemp(), "machines.jsonl")
+    start = 7313000000
+    outcomes = enumerate_machines(
+        start, start + 1000000, path, steps=200, processes=2, chunk=50000
+    )
+    with open(path) as f:
+        results = [json.loads(line) for line in f]
+    assert sum(outcomes.values()) == len(results) > 0
+    assert [r["number"] for r in results] == sorted(r["number"] for r in results)
+    for result in results[:5]:
+        assert run_machine(decode_description_number(result["number"]), 200) == {
+            key: result[key] for key in ["outcome", "steps", "figures"]
+        }
+    print(f"{len(results)} machines: {dict(outcomes)}")
+
+
+if __name__ == "__main__":
+    test_decode_description_number()
+    test_enumerate_machines()
@@ -0,0 +1,194 @@
+"""
+Stream the figures of a Turing machine while it runs.
+
+get_sequence reads the F-squares (0, 2, 4, ...) of the whole tape on every call.
+FigureStream is an observer of the machine (see TuringMachine.observers), it only looks at the writes of each step
+and reports every change of the sequence as an event:
+
+    (kind, index, symbol)
+
+- "print": a figure is written on a blank F-square, it becomes the figure `index` of the sequence
+- "erase": the figure `index` is erased, the figures after it move one place to the left
+- "overwrite": the figure `index` is replaced by `symbol`
+
+A machine printing its figures from left to right costs O(1) per figure.
+A figure printed between two figures or erased costs O(log n + n) (a bisect and a list insertion).
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+from bisect import bisect_left
+from collections import deque
+
+try:
+    from turing_machine.op_extend import NoTransitionError
+except:
+    from op_extend import NoTransitionError
+
+
+class FigureStream:
+    def __init__(self, tm, callback=None, exclude=("$", "_")):
+        """
+        callback(kind, index, symbol) is called for every event,
+        without a callback the events are queued in `events`
+        """
+        self.exclude = set(exclude)
+        self.callback = callback
+        self.events = deque()
+        self.positions = []
+        self.symbols = {}
+        for position in range(0, tm.max_right + 1, 2):
+            symbol = tm.tape[position]
+            if symbol not in self.exclude:
+                self.positions.append(position)
+                self.symbols[position] = symbol
+
+    @property
+    def sequence(self):
+        return "".join(self.symbols[position] for position in self.positions)
+
+    def emit(self, kind, index, symbol):
+        if self.callback is None:
+            self.events.append((kind, index, symbol))
+        else:
+            self.callback(kind, index, symbol)
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        for position, _, new in writes:
+            if position < 0 or position % 2:
+                continue
+            old = self.symbols.get(position)
+            if new in self.exclude:
+                if old is not None:
+                    index = bisect_left(self.positions, position)
+                    del self.positions[index]
+                    del self.symbols[position]
+                    self.emit("erase", index, old)
+            elif old is None:
+                if not self.positions or position > self.positions[-1]:
+                    index = len(self.positions)
+                    self.positions.append(position)
+                else:
+                    index = bisect_left(self.positions, position)
+                    self.positions.insert(index, position)
+                self.symbols[position] = new
+                self.emit("print", index, new)
+            elif old != new:
+                self.symbols[position] = new
+                self.emit("overwrite", bisect_left(self.positions, position), new)
+        return False
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        return False
+
+
+def stream_figures(tm, max_steps=None, chunk=1000):
+    """
+    run the machine and yield the events of its figures as soon as a chunk of steps is done,
+    stop when the machine halts or after max_steps steps
+    """
+    stream = FigureStream(tm)
+    tm.observers.append(stream)
+    done = 0
+    try:
+        while max_steps is None or done < max_steps:
+            steps = chunk if max_steps is None else min(chunk, max_steps - done)
+            # another observer may stop the run before the chunk is done
+            start = tm.step_count
+            try:
+                tm.run(steps=steps)
+            except NoTransitionError:
+                yield from stream.events
+                return
+            done += tm.step_count - start
+            while stream.events:
+                yield stream.events.popleft()
+    finally:
+        tm.observers.remove(stream)
+
+
+# Test Cases
+
+
+def apply_events(sequence: list, events):
+    for kind, index, symbol in events:
+        if kind == "print":
+            sequence.insert(index, symbol)
+        elif kind == "erase":
+            del sequence[index]
+        else:
+            sequence[index] = symbol
+    return sequence
+
+
+class StopEvery:
+    def __init__(self, steps):
+        self.steps = steps
+        self.count = 0
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        self.count += 1
+        return self.count % self.steps == 0
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        return False
+
+
+def test_stream_sqrt2_figures():
+    try:
+        from turing_machine.op_extend import TuringMachine, create_sqrt2_table
+        from turing_machine.compiled import CompiledTuringMachine
+    except:
+        from op_extend import TuringMachine, create_sqrt2_table
+        from compiled import CompiledTuringMachine
+
+    for machine in [TuringMachine, CompiledTuringMachine]:
+        tm = machine(create_sqrt2_table(), "begin")
+        tm.set_history_policy("off")
+        sequence = []
+        for event in stream_figures(tm, max_steps=20000):
+            apply_events(sequence, [event])
+        assert "".join(sequence) == tm.get_sequence()
+        assert tm.observers == []
+        print(f"{machine.__name__}: {len(sequence)} figures, {''.join(sequence)}")
+
+        # an observer which stops the run every 100 steps
+        tm = machine(create_sqrt2_table(), "begin")
+        tm.set_history_policy("off")
+        tm.observers.append(StopEvery(100))
+        list(stream_figures(tm, max_steps=20000))
+        assert tm.step_count == 20000
+
+
+def test_erased_figures():
+    try:
+        from turing_machine.op_extend import Table, TransitionRule, TuringMachine
+    except:
+        from op_extend import Table, TransitionRule, TuringMachine
+
+    table = Table()
+    description = [
+        ("b", "_", ["0", "R", "R", "1", "R", "R", "1", "L", "L"], "e"),
+        ("e", "1", ["_", "L", "L", "1", "R", "R", "R", "R", "0"], "h"),
+    ]
+    for rule in description:
+        table.add_rule(TransitionRule(*rule))
+    tm = TuringMachine(table, "b")
+    events = list(stream_figures(tm))
+    assert events == [
+        ("print", 0, "0"),
+        ("print", 1, "1"),
+        ("print", 2, "1"),
+        ("erase", 1, "1"),
+        ("overwrite", 0, "1"),
+        ("overwrite", 1, "0"),
+    ], events
+    assert "".join(apply_events([], events)) == tm.get_sequence() == "10"
+
+
+if __name__ == "__main__":
+    test_stream_sqrt2_figures()
+    test_erased_figures()
@@ -0,0 +1,125 @@
+"""
+Exact value of the binary sequence computed by a Turing machine.
+
+get_decimal used to sum the float terms 2 ** (-i - 1), which loses every figure after the 53rd.
+The figures 0.b1 b2 ... bn are kept here as one big integer numerator over 2 ** n,
+so the value has no rounding error and any number of decimal digits is rendered with
+one multiplication and one shift:
+
+    floor(numerator * 10 ** digits / 2 ** n)
+
+BinaryFraction is updated incrementally, it is a callback of figures.FigureStream:
+a figure appended at the end costs O(1) big integer operations,
+an erased, inserted or overwritten figure rebuilds the numerator from the figures.
+TuringMachine.track_decimal attaches one, then get_decimal reads it instead of the tape.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+
+def to_decimal(numerator, length, digits):
+    """the first `digits` decimal digits of numerator / 2 ** length (< 1), truncated"""
+    if not digits:
+        return "0."
+    value = (numerator * 10**digits) >> length
+    return "0." + str(value).zfill(digits)
+
+
+def check_binary(sequence):
+    if set(sequence) - {"0", "1"}:
+        raise Exception(f"sequence is not binary: {sequence}")
+
+
+def sequence_to_decimal(sequence: str, digits=None):
+    """
+    digits=None: the nearest float of 0.sequence, else a string of `digits` exact decimal digits
+    """
+    check_binary(sequence)
+    numerator = int(sequence or "0", 2)
+    if digits is None:
+        return numerator / 2 ** len(sequence)
+    return to_decimal(numerator, len(sequence), digits)
+
+
+class BinaryFraction:
+    def __init__(self, sequence=""):
+        check_binary(sequence)
+        self.figures = bytearray(sequence, "ascii")
+        self.numerator = int(sequence or "0", 2)
+
+    def __len__(self):
+        return len(self.figures)
+
+    def __float__(self):
+        return self.numerator / 2 ** len(self.figures)
+
+    def update(self, kind, index, symbol):
+        """a figure event (kind, index, symbol), see figures.FigureStream"""
+        if kind != "erase":
+            check_binary(symbol)
+        if kind == "print" and index == len(self.figures):
+            self.figures.append(ord(symbol))
+            self.numerator = 2 * self.numerator + (symbol == "1")
+            return
+        if kind == "print":
+            self.figures.insert(index, ord(symbol))
+        elif kind == "erase":
+            del self.figures[index]
+        else:
+            self.figures[index] = ord(symbol)
+        self.numerator = int(self.figures or b"0", 2)
+
+    def decimal(self, digits):
+        return to_decimal(self.numerator, len(self.figures), digits)
+
+
+# Test Cases
+
+
+def test_binary_fraction():
+    assert sequence_to_decimal("01" * 50, 30) == "0." + "3" * 30
+    assert sequence_to_decimal("", 3) == "0.000"
+    assert sequence_to_decimal("01" * 50) == 1 / 3
+    fraction = BinaryFraction("0101")
+    fraction.update("print", 4, "0")
+    fraction.update("print", 5, "1")
+    assert fraction.decimal(6) == sequence_to_decimal("010101", 6) == "0.328125"
+    fraction.update("erase", 0, "0")
+    fraction.update("overwrite", 0, "0")
+    fraction.update("print", 0, "1")
+    assert fraction.decimal(6) == sequence_to_decimal("100101", 6)
+    assert float(fraction) == 37 / 64
+
+
+def test_sqrt2_digits():
+    from math import isqrt
+
+    try:
+        from turing_machine.op_extend import create_sqrt2_table
+        from turing_machine.compiled import CompiledTuringMachine
+        from turing_machine.figures import FigureStream
+    except:
+        from op_extend import create_sqrt2_table
+        from compiled import CompiledTuringMachine
+        from figures import FigureStream
+
+    tm = CompiledTuringMachine(create_sqrt2_table(), "begin")
+    tm.set_history_policy("off")
+    fraction = BinaryFraction()
+    tm.observers.append(FigureStream(tm, fraction.update))
+    tm.run(steps=2000000)
+    # n binary figures give n * log10(2) > 0.3 * n exact decimal digits
+    digits = len(fraction) * 3 // 10
+    assert fraction.decimal(digits) == tm.get_decimal(digits=digits)
+    # the machine prints sqrt(2) = 1.0110101..., read as 0.10110101... it is sqrt(2) / 2
+    expected = str(isqrt(10 ** (2 * digits) // 2)).zfill(digits)
+    assert fraction.decimal(digits) == "0." + expected
+    print(f"{len(fraction)} figures, sqrt(2) / 2 = {fraction.decimal(digits)}")
+
+
+if __name__ == "__main__":
+    test_binary_fraction()
+    test_sqrt2_digits()
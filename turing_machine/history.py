@@ -0,0 +1,115 @@
+"""
+Recorders for the history of complete configurations of a Turing machine.
+
+Copying the whole tape after every step makes a run cost O(steps * tape) time and memory,
+so the recorders only keep one small event per step:
+
+    (writes, head, m_config, max_right, min_left)
+
+- writes: ((position, old symbol, new symbol), ...) in the order they happened
+- head, m_config, max_right, min_left: the head position, m-configuration, right end and left end
+  after the step
+
+A scan loop of the compiled engine (a run of steps which only move the head in one direction)
+is recorded as one event:
+
+    (count, move, head, m_config, max_right, min_left)
+
+with the head position and both ends before the first step of the run.
+
+The complete configurations are rebuilt on demand, walking back from the current tape
+and undoing the writes of each event. Each one spans the squares from the left end to the right end
+of its own step, as a copy of the tape made after that step would.
+
+Policies:
+
+- "off": no history
+- "delta": every event of the run
+- "ring": only the events of the last K steps
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+from collections import deque
+
+
+class DeltaHistory:
+    def __init__(self, size=None):
+        """
+        size: keep only the last `size` events, None for all
+        """
+        self.events = deque(maxlen=size)
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        self.events.append((tuple(writes), head, m_config, max_right, min_left))
+        return False
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        self.events.append((count, move, head, m_config, max_right, min_left))
+        return False
+
+    def clear(self):
+        self.events.clear()
+
+    def __len__(self):
+        return len(self.events)
+
+    def configurations(self, tape: list, left=0):
+        """
+        tape: the current tape of the machine (from left to max_right), it will not be modified
+        left: the position of tape[0], the left end of the machine
+
+        return the complete configurations in Turing's format (see TuringMachine.str(turing=True))
+        """
+        tape = list(tape)
+        result = []
+        for event in reversed(self.events):
+            if len(event) == 6:
+                count, move, start, m_config, start_max_right, start_min_left = event
+                for i in range(count, 0, -1):
+                    head = start + i * move - left
+                    max_right = max(start_max_right - left, head)
+                    min_left = min(start_min_left - left, head)
+                    result.append(
+                        tape[min_left:head] + [m_config] + tape[head : max_right + 1]
+                    )
+                continue
+            writes, head, m_config, max_right, min_left = event
+            head, max_right, min_left = head - left, max_right - left, min_left - left
+            result.append(
+                tape[min_left:head] + [m_config] + tape[head : max_right + 1]
+            )
+            for position, old, _ in reversed(writes):
+                tape[position - left] = old
+        result.reverse()
+        return result
+
+
+class RingHistory(DeltaHistory):
+    def __init__(self, size):
+        """
+        one event covers at least one step, so `size` events cover the last `size` steps
+        """
+        assert size > 0, "the ring buffer should keep at least one configuration"
+        super().__init__(size)
+        self.size = size
+
+    def configurations(self, tape: list, left=0):
+        return super().configurations(tape, left)[-self.size :]
+
+
+def create_history(policy="delta", size=None):
+    if policy == "off" or policy is None:
+        return None
+    if policy == "delta":
+        return DeltaHistory()
+    if policy == "ring":
+        if size is None:
+            raise ValueError(
+                'the "ring" history policy needs a size: the number of steps to keep'
+            )
+        return RingHistory(size)
+    raise Exception(f"unknown history policy: {policy}")
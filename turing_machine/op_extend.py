@@ -13,25 +13,72 @@ Features:
 
 - pretty print for complete configuration
 
+- history policy: "delta" (default), "ring" or "off", see history.py
+
+- bi-infinite tape made of pages allocated on demand, or a compact bytearray tape, see tape.py
+
+- run until halting, a predicate or a repeated complete configuration, see cycle.py
+
+- binary checkpoints to resume long runs, see checkpoint.py
+
+- opt-in profiling of m-configurations and transitions, see profiler.py
+
+- exact get_decimal with any number of digits, see fraction.py
+
+- binary traces of the steps with sampling, read back offline, see tracer.py
+
+- load a standard description from a str, bytes or a memory-mapped file in bulk, see load_instruction
+
 
 Author: Metaesc
 Email: metaescape@foxmail.com
 License: MIT License
 """
 
+import mmap
+import os
+
+try:
+    from turing_machine.history import create_history
+    from turing_machine.tape import PagedTape, ByteTape
+    from turing_machine.cycle import CycleDetector
+    from turing_machine.fraction import sequence_to_decimal
+except:
+    from history import create_history
+    from tape import PagedTape, ByteTape
+    from cycle import CycleDetector
+    from fraction import sequence_to_decimal
+
+# the characters of a standard description
+INSTRUCTION_ALPHABET = "RLN;DAC"
+
+
+class NoTransitionError(Exception):
+    """the machine halts: no transition for the current configuration"""
+
 
 class TuringMachine:
     """
     This is a Turing machine interpreter, not a universal Turing machine.
     """
 
-    def __init__(self, table, initial_state):
-        self.tape = ["_"] * 2000
+    def __init__(self, table, initial_state, compact=False):
+        """
+        compact: store the tape in a bytearray, one byte per square
+        """
+        self.tape = ByteTape(blank="_") if compact else PagedTape("_")
         self.head_position = 0
         self.table = table
         self.current_state = initial_state
         self.max_right = 0
-        self.history = []
+        self.min_left = 0
+        self.recorder = create_history("delta")
+        self.observers = []
+        self.profiler = None
+        self.trace = None
+        # the value of the sequence kept up to date while the machine runs, see track_decimal
+        self.fraction = None
+        self.step_count = 0
         self.fill_len = 3
 
     @property
@@ -40,11 +87,7 @@ class TuringMachine:
 
     @property
     def scanned_symbol(self):
-        return (
-            self.tape[self.head_position]
-            if self.head_position < len(self.tape)
-            else " "
-        )
+        return self.tape[self.head_position]
 
     @property
     def configuration(self):
@@ -57,14 +100,31 @@ class TuringMachine:
         """
         return (self.m_configuration, self.get_tape())
 
+    @property
+    def history(self):
+        """complete configurations after each step, rebuilt from the recorded deltas"""
+        if self.recorder is None:
+            return []
+        return self.recorder.configurations(self.get_tape(), self.min_left)
+
+    def set_history_policy(self, policy, size=None):
+        """
+        policy: "off", "delta" (every step) or "ring" (the last `size` steps)
+        """
+        self.recorder = create_history(policy, size)
+
+    def clear_history(self):
+        """the recorded deltas are only valid for the current tape"""
+        if self.recorder is not None:
+            self.recorder.clear()
+
     def set_tape(self, tape):
-        n = len(tape)
-        if n > len(self.tape):
-            self.tape.extend(["_"] * (n - len(self.tape)))
-        self.tape[:n] = tape
+        self.clear_history()
+        self.tape[: len(tape)] = tape
         self.max_right = len(tape)
 
     def set_figures(self, string):
+        self.clear_history()
         self.max_right = 2
         self.tape[:2] = ["$", "$"]
         for i in range(len(string)):
@@ -73,9 +133,9 @@ class TuringMachine:
 
     def get_tape(self):
         """
-        point: left or bracket
+        squares from the leftmost (0 unless the head has moved to the left of 0) to max_right
         """
-        tape = self.tape[: self.max_right + 1]
+        tape = self.tape[self.min_left : self.max_right + 1]
         return tape
 
     def set_fill_len(self, fill_len):
@@ -85,24 +145,18 @@ class TuringMachine:
     def str(self, turing=False):
         tape = self.get_tape()
         m_config = self.m_configuration
+        head = self.head_position - self.min_left
         if turing:
-            left = tape[: self.head_position]
-            right = tape[self.head_position :]
+            left = tape[:head]
+            right = tape[head:]
             return left + [self.m_configuration] + right
         else:
-            tape[self.head_position] = f"[{tape[self.head_position]}]"
+            tape[head] = f"[{tape[head]}]"
             s = "".join(tape)
             return f"{m_config:>{self.fill_len}} | {s}"
 
     def get_sequence(self):
-        result = []
-        for i in range(0, self.max_right + 1, 2):
-            if self.tape[i] not in {
-                "$",
-                "_",
-            }:
-                result.append(self.tape[i])
-        return "".join(result)
+        return self.tape.join(0, self.max_right + 1, 2, exclude={"$", "_"})
 
     def get_binary(self):
         seq = self.get_sequence()
@@ -122,73 +176,230 @@ class TuringMachine:
             + ":"
         )
 
-    def get_decimal(self):
+    def get_decimal(self, digits=None):
+        """
+        convert 0.01010101... to 1/3 in decimal, exactly, see fraction.py
+        digits: return a string of `digits` truncated decimal digits instead of a float
+
+        this reads and parses the whole sequence, O(n) per call,
+        after track_decimal it is read from the fraction maintained while the machine runs
         """
-        convert 0.01010101... to 1/3 in decimal
+        if self.fraction is not None:
+            if digits is None:
+                return float(self.fraction)
+            return self.fraction.decimal(digits)
+        return sequence_to_decimal(self.get_sequence(), digits)
+
+    def track_decimal(self):
         """
-        sequence = self.get_sequence()
-        result = 0
-        for i in range(len(sequence)):
-            result += int(sequence[i]) * 2 ** (-i - 1)
-        return result
+        maintain the value of the sequence while the machine runs:
+        a fraction.BinaryFraction fed by a figures.FigureStream observer,
+        a figure appended at the end costs O(1), and get_decimal no longer reads the tape
+
+        the F-squares should only hold "0" and "1", another figure raises while the machine runs
+        """
+        try:
+            from turing_machine.fraction import BinaryFraction
+            from turing_machine.figures import FigureStream
+        except:
+            from fraction import BinaryFraction
+            from figures import FigureStream
+        if self.fraction is None:
+            self.fraction = BinaryFraction(self.get_sequence())
+            self.observers.append(FigureStream(self, self.fraction.update))
+        return self.fraction
 
     def step(self, idx, verbose):
-        """single step"""
+        """
+        single step, return True if an observer asks to stop the run
+        """
         configuration = self.configuration
 
         if configuration in self.table:
             operations, next_m_config = self.table[configuration]
+            writes = []
             for operation in operations:
                 if operation == "R":
                     self.head_position += 1
                     self.max_right = max(self.head_position, self.max_right)
-                    if self.head_position >= len(self.tape):
-                        length_before = len(self.tape)
-                        self.tape.extend(["_"] * len(self.tape))
-                        print(
-                            f"Warning: head position is out of tape,"
-                            f"extend tape from length {length_before} to {len(self.tape)}"
-                        )
                 elif operation == "L":
                     self.head_position -= 1
-                    if self.head_position < 0:
-                        print("Warning: head position is negative, reset to 0")
-                        self.head_position = 0
-
+                    self.min_left = min(self.head_position, self.min_left)
                 elif operation != "N":
                     write_symbol = operation
-
+                    writes.append(
+                        (
+                            self.head_position,
+                            self.tape[self.head_position],
+                            write_symbol,
+                        )
+                    )
                     self.tape[self.head_position] = write_symbol
 
             self.current_state = next_m_config
-            self.history.append(self.str(turing=True))
+            self.step_count += 1
+            stop = False
+            for recorder in self.recorders():
+                stop = recorder.record(
+                    writes,
+                    self.head_position,
+                    self.current_state,
+                    self.max_right,
+                    self.min_left,
+                ) or stop
             if verbose == True or (verbose and idx in verbose):
                 print(f"{idx + 1}: {self.str(turing=False)}")
+            return stop
 
         else:
-            raise Exception(
+            raise NoTransitionError(
                 f"No transition defined for the current configuration {configuration}"
             )
 
+    def recorders(self):
+        """the history recorder and the observers, they receive an event for every step"""
+        if self.recorder is None:
+            return self.observers
+        return [self.recorder] + self.observers
+
     def run(self, steps=1000, verbose=False):
-        for i in range(steps):
-            self.step(i, verbose=verbose)
+        try:
+            for i in range(steps):
+                if self.step(i, verbose=verbose):
+                    break
+        except BaseException:
+            # write the trailer, a trace without it cannot be read back, see tracer.py
+            self.stop_trace()
+            raise
+
+    def run_until(
+        self, max_steps=None, predicate=None, detect_cycle=True, check_every=1
+    ):
+        """
+        run until:
+        - "halted": no transition for the current configuration
+        - "predicate": predicate(self) is True, checked every `check_every` steps
+        - "cycle": a complete configuration is repeated, the machine loops forever
+        - "max_steps": max_steps steps are done (None for no limit)
+
+        return the reason and the number of steps
+        """
+        start = self.step_count
+        detector = CycleDetector(self) if detect_cycle else None
+        if detector is not None:
+            self.observers.append(detector)
+        try:
+            while True:
+                done = self.step_count - start
+                if max_steps is not None and done >= max_steps:
+                    return "max_steps", done
+                steps = check_every if predicate is not None else 1 << 16
+                if max_steps is not None:
+                    steps = min(steps, max_steps - done)
+                try:
+                    self.run(steps=steps)
+                except NoTransitionError:
+                    return "halted", self.step_count - start
+                if detector is not None and detector.found:
+                    return "cycle", self.step_count - start
+                if predicate is not None and predicate(self):
+                    return "predicate", self.step_count - start
+        finally:
+            if detector is not None:
+                self.observers.remove(detector)
+
+    def start_profiling(self, bucket=1):
+        """count the steps of every m-configuration and transition, see profiler.py"""
+        try:
+            from turing_machine.profiler import Profiler
+        except:
+            from profiler import Profiler
+        self.stop_profiling()
+        self.profiler = Profiler(self, bucket)
+        self.observers.append(self.profiler)
+        return self.profiler
+
+    def stop_profiling(self):
+        profiler = self.profiler
+        if profiler in self.observers:
+            self.observers.remove(profiler)
+        self.profiler = None
+        return profiler
+
+    def start_trace(self, path, every=1, steps=None, states=None):
+        """write binary records of the steps to `path`, see tracer.py"""
+        try:
+            from turing_machine.tracer import TraceSink
+        except:
+            from tracer import TraceSink
+        self.stop_trace()
+        self.trace = TraceSink(self, path, every, steps, states)
+        self.observers.append(self.trace)
+        return self.trace
+
+    def stop_trace(self):
+        trace = self.trace
+        if trace in self.observers:
+            self.observers.remove(trace)
+            trace.close()
+        self.trace = None
+        return trace
+
+    def save_checkpoint(self, path):
+        """binary snapshot of the machine, see checkpoint.py"""
+        try:
+            from turing_machine import checkpoint
+        except:
+            import checkpoint
+        checkpoint.save(self, path)
+
+    def load_checkpoint(self, path):
+        """resume from a snapshot of a machine with the same table"""
+        try:
+            from turing_machine import checkpoint
+        except:
+            import checkpoint
+        return checkpoint.load(self, path)
 
     def load_instruction(self, code):
         """
         for universal turing machine
+        code: the standard description, a str or a bytes-like object (bytes, bytearray, mmap),
+        it is checked and written to the F-squares in bulk, see tape.load
         """
-        vocab = set(code)
-        assert vocab.issubset({"R", "L", "N", ";", "D", "A", "C"})
-        length = len(code) * 2 * 2
-        if length > len(self.tape):
-            self.tape = ["_"] * length
+        try:
+            if isinstance(code, str):
+                code = code.encode("ascii")
+            else:
+                code = memoryview(code).cast("B")
+            # the characters are checked while they are written, nothing is copied before
+            self.tape.load(2, 2, code, INSTRUCTION_ALPHABET)
+        except UnicodeError:
+            raise AssertionError(
+                "the standard description only uses R L N ; D A C"
+            ) from None
+        self.clear_history()
         self.tape[:2] = ["$", "$"]
-        for i in range(len(code)):
-            self.tape[2 + i * 2] = code[i]
         self.tape[2 + len(code) * 2] = "::"
         self.max_right = 2 + len(code) * 2
 
+    def load_instruction_file(self, path):
+        """
+        load_instruction from a file, memory-mapped (a multi-megabyte description is never a str),
+        the whitespace at both ends is ignored
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return self.load_instruction(b"")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                start, stop = 0, len(data)
+                while start < stop and data[start : start + 1].isspace():
+                    start += 1
+                while stop > start and data[stop - 1 : stop].isspace():
+                    stop -= 1
+                with memoryview(data) as view:
+                    self.load_instruction(view[start:stop])
+
 
 class TransitionRule:
 
@@ -231,6 +442,8 @@ class Table:
     def __init__(self):
         self.table = {}
         self.rules = []
+        # generated runners, see codegen.py
+        self.generated = {}
 
     def __contains__(self, key):
         m_config, _ = key
@@ -289,6 +502,14 @@ def test_1_3_machine():
     print(tm.get_sequence())
     print(tm.get_decimal())
 
+    # the same values from the fraction maintained while the machine runs
+    tracked = TuringMachine(bcek_table, "b")
+    tracked.track_decimal()
+    tracked.run(steps=20)
+    assert tracked.fraction is not None
+    assert tracked.get_decimal() == tm.get_decimal()
+    assert tracked.get_decimal(12) == sequence_to_decimal(tm.get_sequence(), 12)
+
 
 def test_transcendental_machine():
     """
@@ -347,6 +568,164 @@ def test_increment_machine():
         print(int(tm.get_sequence()[::-1], 2))
 
 
+def test_history_policy():
+    """
+    the history rebuilt from deltas is the same as copying the tape after every step
+    """
+    table = create_sqrt2_table()
+    steps = 500
+
+    tm = TuringMachine(table, "begin")
+    tm.set_history_policy("off")
+    copies = []
+    for i in range(steps):
+        tm.step(i, verbose=False)
+        copies.append(tm.str(turing=True))
+    assert tm.history == []
+
+    tm = TuringMachine(table, "begin")
+    tm.run(steps=steps)
+    assert tm.history == copies
+
+    tm = TuringMachine(table, "begin")
+    tm.set_history_policy("ring", 10)
+    tm.run(steps=steps)
+    assert tm.history == copies[-10:]
+    try:
+        tm.set_history_policy("ring")
+    except ValueError as error:
+        assert "size" in str(error)
+    else:
+        raise AssertionError("a ring history without a size")
+
+    # the configurations before the head goes left of 0 keep their own left end
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["x", "R", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["y", "L"], "d"))
+    table.add_rule(TransitionRule("d", "*", ["L"], "d"))
+    tm = TuringMachine(table, "b")
+    tm.set_history_policy("off")
+    left_copies = []
+    for i in range(8):
+        tm.step(i, verbose=False)
+        left_copies.append(tm.str(turing=True))
+    assert left_copies[0] == ["x", "_", "c", "_"]
+    tm = TuringMachine(table, "b")
+    tm.run(steps=8)
+    assert tm.history == left_copies
+    print("history policy: the last complete configuration")
+    print("".join(tm.history[-1]))
+
+
+def test_compact_tape():
+    """
+    the bytearray tape gives the same results as the paged tape
+    """
+    table = create_sqrt2_table()
+    tm = TuringMachine(table, "begin")
+    tm.run(steps=2000)
+    compact_tm = TuringMachine(table, "begin", compact=True)
+    compact_tm.run(steps=2000)
+    assert tm.get_tape() == compact_tm.get_tape()
+    assert tm.history == compact_tm.history
+    assert tm.get_sequence() == compact_tm.get_sequence()
+    print(f"compact tape: {compact_tm.get_binary()}")
+
+    tm.load_instruction("DADDCRDAA")
+    compact_tm.load_instruction("DADDCRDAA")
+    assert tm.get_tape() == compact_tm.get_tape()
+    print("".join(compact_tm.get_tape()))
+
+
+def test_load_instruction_file():
+    import tempfile
+    import time
+
+    print("load a large standard description from a memory-mapped file")
+    code = ";DADDCRDAA;DAADDCCRDA" * 50000
+    path = os.path.join(tempfile.mkdtemp(), "description.txt")
+    with open(path, "w") as f:
+        f.write(code + "\n")
+
+    tm = TuringMachine(Table(), "q1")
+    tm.load_instruction(code[:1000])
+    compact_tm = TuringMachine(Table(), "q1", compact=True)
+    compact_tm.load_instruction(code[:1000].encode("ascii"))
+    assert tm.get_tape() == compact_tm.get_tape()
+
+    start = time.perf_counter()
+    compact_tm = TuringMachine(Table(), "q1", compact=True)
+    compact_tm.load_instruction_file(path)
+    elapsed = time.perf_counter() - start
+    assert compact_tm.max_right == 2 + len(code) * 2
+    assert compact_tm.tape.join(2, compact_tm.max_right, 2) == code
+    assert compact_tm.tape[compact_tm.max_right] == "::"
+    assert compact_tm.tape[3] == "_"
+    print(f"{len(code)} characters in {elapsed:.4f}s")
+
+    for machine, code in [(tm, ";DADXCRDAA"), (compact_tm, bytearray(b";DAD\nCRDAA"))]:
+        try:
+            machine.load_instruction(code)
+        except AssertionError:
+            pass
+        else:
+            raise AssertionError(f"{code!r} is not a standard description")
+
+
+def create_loop_tables():
+    """
+    a machine looping in place, a machine bouncing between two marks and a halting machine
+    """
+    tables = []
+    for description in [
+        [
+            ("a", "_", ["x", "R"], "b"),
+            ("b", "_", ["L"], "c"),
+            ("c", "x", ["_"], "a"),
+        ],
+        [
+            ("b", "_", ["$", "R", "R", "R", "R", "$", "L"], "l"),
+            ("l", "_", ["L"], "l"),
+            ("l", "$", ["R"], "r"),
+            ("r", "_", ["R"], "r"),
+            ("r", "$", ["L"], "l"),
+        ],
+        [
+            ("b", "_", ["1", "R", "R"], "c"),
+            ("c", "_", ["1", "L", "L"], "b"),
+        ],
+    ]:
+        table = Table()
+        for rule in description:
+            table.add_rule(TransitionRule(*rule))
+        tables.append(table)
+    return tables
+
+
+def test_run_until():
+    in_place, bounce, halting = create_loop_tables()
+    tm = TuringMachine(in_place, "a")
+    # the first repetition is after 3 steps, Brent's algorithm sees it after 6
+    assert tm.run_until(max_steps=100) == ("cycle", 6)
+    assert tm.observers == []
+
+    tm = TuringMachine(bounce, "b")
+    reason, steps = tm.run_until(max_steps=100)
+    assert reason == "cycle" and steps < 100, (reason, steps)
+    print(f"bouncing machine: cycle found after {steps} steps")
+
+    tm = TuringMachine(halting, "b")
+    assert tm.run_until() == ("halted", 2)
+    assert tm.m_configuration == "b" and tm.scanned_symbol == "1"
+
+    tm = TuringMachine(create_sqrt2_table(), "begin")
+    assert tm.run_until(max_steps=500) == ("max_steps", 500)
+    predicate = lambda tm: len(tm.get_sequence()) >= 5
+    assert tm.run_until(predicate=predicate) == ("predicate", tm.step_count - 500)
+    assert tm.get_sequence()[:5] == "10110"
+    print(f"sqrt(2) machine: 5 figures after {tm.step_count} steps")
+
+
 def create_sqrt2_table():
     table = Table()
     description = [
@@ -439,3 +818,7 @@ if __name__ == "__main__":
     test_transcendental_machine()
     test_increment_machine()
     test_sqrt_root_machine()
+    test_history_policy()
+    test_compact_tape()
+    test_load_instruction_file()
+    test_run_until()
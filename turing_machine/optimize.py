@@ -0,0 +1,493 @@
+"""
+Optimisation passes over the tables compiled by SkelotonCompiler (abbreviated.py).
+
+SkelotonCompiler.compile emits a rule for every instantiated m-configuration.
+The passes here only keep what the machine can do from a chosen entry m-configuration:
+
+- prune: drop the m-configurations which are unreachable from the entry
+- collapse_aliases: an m-configuration whose only rule is "* -> [] -> next" is replaced by next
+- merge_equivalent: Hopcroft's partition refinement over the behavior of every m-configuration,
+  (operations, block of the next m-configuration) for every scanned symbol,
+  the m-configurations in one block are replaced by the first of them
+
+The scanned symbols are the symbols of the rules plus "*" for any other symbol,
+so two m-configurations are only merged when they behave the same on every tape.
+An m-configuration without rules (e.g. "success") is never merged, the machine halts in it by name.
+
+Every pass returns a renaming {old m-configuration: new m-configuration}, see minimize.
+
+optimize then rewrites the operations, between SkelotonCompiler.compile and the execution:
+
+- peephole: drop "N", cancel "L" "R" and the writes overwritten before a move
+- fuse: an m-configuration which does the same on every scanned symbol (e.g. Left, Right) is
+  absorbed by the rules which go to it, so a chain of them is one step
+
+One step of the optimized table stands for several steps of the original one,
+the weights and a profiler give the steps of the original run, see reference_steps.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+from collections import deque
+
+try:
+    from turing_machine.op_extend import (
+        Table,
+        TransitionRule,
+        TuringMachine,
+        NoTransitionError,
+    )
+except:
+    from op_extend import Table, TransitionRule, TuringMachine, NoTransitionError
+
+
+def table_rows(table: Table):
+    """m-configuration -> {scanned symbol: (operations, next m-configuration)}"""
+    rows = {}
+    for (m_config, symbol), (operations, next_m_config) in table.table.items():
+        rows.setdefault(m_config, {})[symbol] = (tuple(operations), next_m_config)
+    return rows
+
+
+def m_configurations(table: Table):
+    """every m-configuration of the table in the order of the rules, including the ones without rules"""
+    names = {}
+    for rule in table.rules:
+        names[rule.m_config] = None
+    for rule in table.rules:
+        names[rule.next_m_config] = None
+    return list(names)
+
+
+def rename(table: Table, renaming: dict):
+    """
+    keep the rules of the m-configurations which are renamed to themselves,
+    and point every rule to the renamed next m-configuration
+    """
+    result = Table()
+    for rule in table.rules:
+        if renaming.get(rule.m_config) != rule.m_config:
+            continue
+        result.add_rule(
+            TransitionRule(
+                rule.m_config,
+                rule.symbols,
+                list(rule.operations),
+                renaming[rule.next_m_config],
+            )
+        )
+    return result
+
+
+def reachable(table: Table, entry):
+    """the m-configurations reachable from entry, in breadth-first order"""
+    rows = table_rows(table)
+    seen = {entry: None}
+    queue = deque([entry])
+    while queue:
+        m_config = queue.popleft()
+        for _, next_m_config in rows.get(m_config, {}).values():
+            if next_m_config not in seen:
+                seen[next_m_config] = None
+                queue.append(next_m_config)
+    return list(seen)
+
+
+def prune(table: Table, entry):
+    renaming = {m_config: m_config for m_config in reachable(table, entry)}
+    return rename(table, renaming), renaming
+
+
+def collapse_aliases(table: Table):
+    """
+    an alias only goes to the next m-configuration without operations,
+    the chains of aliases are followed to their end, a cycle of aliases is kept
+    """
+    forward = {}
+    for m_config, row in table_rows(table).items():
+        behaviors = set(row.values())
+        if "*" in row and len(behaviors) == 1:
+            operations, next_m_config = behaviors.pop()
+            if not operations and next_m_config != m_config:
+                forward[m_config] = next_m_config
+
+    renaming = {}
+    for m_config in m_configurations(table):
+        chain = [m_config]
+        while chain[-1] in forward and forward[chain[-1]] not in chain:
+            chain.append(forward[chain[-1]])
+        end = chain[-1]
+        renaming[m_config] = m_config if end in forward else end
+    return rename(table, renaming), renaming
+
+
+def equivalent_states(table: Table):
+    """
+    Hopcroft's algorithm, the letters are the scanned symbols and "*"
+
+    The initial partition groups the m-configurations by their operations for every letter,
+    so the m-configurations of a block are defined on the same letters.
+    A block (the splitter) and a letter split every block into the m-configurations which go
+    into the splitter on that letter and the others. When a block is split, the smaller half
+    is enough as a future splitter, unless the block was still waiting to be used.
+
+    return {m-configuration: the first m-configuration of its block}
+    """
+    rows = table_rows(table)
+    names = m_configurations(table)
+    index = {m_config: i for i, m_config in enumerate(names)}
+    letters = sorted({symbol for row in rows.values() for symbol in row})
+
+    # behaviors[i][a]: what m-configuration i does when it scans letters[a]
+    behaviors = []
+    for m_config in names:
+        row = rows.get(m_config, {})
+        default = row.get("*")
+        behaviors.append([row.get(symbol, default) for symbol in letters])
+
+    inverse = [{} for _ in letters]
+    for i, behavior in enumerate(behaviors):
+        for a, rule in enumerate(behavior):
+            if rule is not None:
+                inverse[a].setdefault(index[rule[1]], []).append(i)
+
+    initial = {}
+    for i, behavior in enumerate(behaviors):
+        if names[i] in rows:
+            signature = tuple(rule and rule[0] for rule in behavior)
+        else:
+            signature = names[i]
+        initial.setdefault(signature, []).append(i)
+    blocks = list(initial.values())
+    block_of = [0] * len(names)
+    for b, block in enumerate(blocks):
+        for i in block:
+            block_of[i] = b
+
+    pending = deque((b, a) for b in range(len(blocks)) for a in range(len(letters)))
+    waiting = set(pending)
+    while pending:
+        splitter = pending.popleft()
+        waiting.discard(splitter)
+        b, a = splitter
+        touched = {}
+        for target in blocks[b]:
+            for i in inverse[a].get(target, ()):
+                touched.setdefault(block_of[i], []).append(i)
+        for y, inside in touched.items():
+            if len(inside) == len(blocks[y]):
+                continue
+            inside_set = set(inside)
+            blocks[y] = [i for i in blocks[y] if i not in inside_set]
+            new = len(blocks)
+            blocks.append(sorted(inside))
+            for i in inside:
+                block_of[i] = new
+            for c in range(len(letters)):
+                if (y, c) in waiting or len(inside) <= len(blocks[y]):
+                    half = (new, c)
+                else:
+                    half = (y, c)
+                pending.append(half)
+                waiting.add(half)
+
+    return {m_config: names[min(blocks[block_of[i]])] for m_config, i in index.items()}
+
+
+def merge_equivalent(table: Table):
+    renaming = equivalent_states(table)
+    return rename(table, renaming), renaming
+
+
+def minimize(table: Table, entry):
+    """
+    collapse the aliases, merge the equivalent m-configurations, then prune from entry
+
+    return the new table, the new entry and the renaming of the m-configurations which are kept
+    """
+    table, aliases = collapse_aliases(table)
+    table, merged = merge_equivalent(table)
+    entry = merged[aliases[entry]]
+    table, kept = prune(table, entry)
+    renaming = {}
+    for m_config, alias in aliases.items():
+        if merged[alias] in kept:
+            renaming[m_config] = merged[alias]
+    return table, entry, renaming
+
+
+def peephole(operations):
+    """
+    - "N" is dropped
+    - "L" then "R" (or "R" then "L") cancel
+    - a write is dropped when the same square is written again before a move
+    """
+    result = []
+    for operation in operations:
+        if operation == "N":
+            continue
+        if result:
+            last = result[-1]
+            if {last, operation} == {"L", "R"}:
+                result.pop()
+                continue
+            if last not in ("L", "R") and operation not in ("L", "R"):
+                result[-1] = operation
+                continue
+        result.append(operation)
+    return result
+
+
+def rule_keys(rule: TransitionRule):
+    """the keys of the rule in Table.table, see Table.add_rule"""
+    symbols = [rule.symbols] if not rule.symbols else rule.symbols
+    if "::" in symbols:
+        return [(rule.m_config, "::")]
+    return [(rule.m_config, symbol) for symbol in symbols]
+
+
+def unconditional(table: Table):
+    """m-configuration -> (operations, next m-configuration) when it does the same on every scanned symbol"""
+    result = {}
+    for m_config, row in table_rows(table).items():
+        behaviors = set(row.values())
+        if "*" in row and len(behaviors) == 1:
+            operations, next_m_config = behaviors.pop()
+            if next_m_config != m_config:
+                result[m_config] = (operations, next_m_config)
+    return result
+
+
+def fuse(table: Table):
+    """
+    superinstructions: a rule which goes to an unconditional m-configuration takes its operations
+    and goes to its next m-configuration, along the whole chain (a cycle is followed once)
+
+    return the new table and the weights {(m-configuration, scanned symbol): steps of the original table}
+
+    the new machine is not step-for-step identical to the original one: a step covers `weight` original steps,
+    and as the peephole cancels "L" "R" pairs, the head no longer visits those squares,
+    so the max_right and min_left it reports may be smaller than those of the original machine
+    """
+    forward = unconditional(table)
+    result = Table()
+    weights = {}
+    for rule in table.rules:
+        operations = list(rule.operations)
+        next_m_config = rule.next_m_config
+        weight = 1
+        visited = set()
+        while next_m_config in forward and next_m_config not in visited:
+            visited.add(next_m_config)
+            more, next_m_config = forward[next_m_config]
+            operations.extend(more)
+            weight += 1
+        result.add_rule(
+            TransitionRule(
+                rule.m_config, rule.symbols, peephole(operations), next_m_config
+            )
+        )
+        for key in rule_keys(rule):
+            weights[key] = weight
+    return result, weights
+
+
+def optimize(table: Table, entry):
+    """
+    minimize, then the peephole and the superinstructions, then prune from entry
+
+    one step of the new table is weights[(m-configuration, scanned symbol)] steps of the original one,
+    see reference_steps, and the bounds of the tape may differ (see fuse)
+
+    the gain is small on the universal machine: 3000 -> 2963 rules,
+    and 20000 steps of the optimized table are only 20074 steps of the original one (0.4%)
+    """
+    table, entry, _ = minimize(table, entry)
+    table, weights = fuse(table)
+    table, kept = prune(table, entry)
+    weights = {key: weight for key, weight in weights.items() if key[0] in kept}
+    return table, entry, weights
+
+
+def reference_steps(profiler, weights):
+    """
+    the steps of the original table for the transitions counted by a profiler (profiler.py)
+    of a machine which runs the optimized table
+    """
+    steps = 0
+    for (m_config, symbol), hits in profiler.transitions.items():
+        weight = weights.get((m_config, symbol), weights.get((m_config, "*"), 1))
+        steps += weight * hits
+    return steps
+
+
+# Test Cases
+
+
+def test_minimize_table():
+    print("minimize a table with duplicated, aliased and unreachable m-configurations")
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["_", "R"], "d"))
+    table.add_rule(TransitionRule("d", "_", ["0", "R"], "alias"))
+    table.add_rule(TransitionRule("alias", "*", [], "e"))
+    table.add_rule(TransitionRule("e", "_", ["_", "R"], "b"))
+    table.add_rule(TransitionRule("lost", "*", ["1", "R"], "b"))
+    table.add_rule(TransitionRule("loop", "*", [], "loop"))
+
+    minimal, entry, renaming = minimize(table, "b")
+    print(minimal)
+    assert entry == "b"
+    assert renaming == {"b": "b", "c": "c", "d": "b", "alias": "c", "e": "c"}
+    assert len(minimal.rules) == 2
+
+    tm = TuringMachine(table, "b")
+    tm.run(steps=25)
+    small = TuringMachine(minimal, entry)
+    small.run(steps=20)
+    assert tm.get_tape() == small.get_tape()
+
+
+def test_minimize_abbreviated():
+    try:
+        from turing_machine.abbreviated import SkelotonCompiler, AbbreviatedTable, Find
+    except:
+        from abbreviated import SkelotonCompiler, AbbreviatedTable, Find
+
+    class PrintEvery(AbbreviatedTable):
+        """print beta on every F-square, counting a parity which nothing reads"""
+
+        def __init__(self, beta, parity):
+            super().__init__()
+            self.add_transition("*", [beta, "R", "R"], PrintEvery(beta, 1 - parity))
+
+    print("the m-functions with different arguments can be the same m-configuration")
+    SkelotonCompiler.reset()
+    SkelotonCompiler.set_vocab({"0", "1", "x"})
+    unused = Find("success", "fail", "0")
+    entry = Find(PrintEvery("1", 0), "fail", "x")
+    table = SkelotonCompiler.compile()
+    name = SkelotonCompiler.get_m_config_name(entry)
+    minimal, start, renaming = minimize(table, name)
+    print(f"{len(m_configurations(table))} -> {len(m_configurations(minimal))} m-configurations")
+    assert SkelotonCompiler.get_m_config_name(unused) not in renaming
+    assert len(set(renaming.values())) == len(renaming) - 1
+    assert start == name
+    assert len(SkelotonCompiler.minimize(table, entry).rules) == len(minimal.rules)
+    assert unused not in SkelotonCompiler.obj2name
+    assert set(SkelotonCompiler.name2class.values()) == {"Find", "Find1", "Miss1", "PrintEvery"}
+
+    for tape in ["$$0x1", "$$01", "$$x"]:
+        results = []
+        for t, m_config in [(table, name), (minimal, start)]:
+            tm = TuringMachine(t, m_config)
+            for i, symbol in enumerate(tape):
+                tm.tape[i] = symbol
+            try:
+                tm.run(steps=30)
+            except NoTransitionError:
+                pass
+            results.append((tm.get_tape(), tm.head_position, renaming[tm.m_configuration]))
+        assert results[0] == results[1], results
+
+
+def test_minimize_universal_machine():
+    import io
+    from contextlib import redirect_stdout
+
+    try:
+        from turing_machine.universal import EntryUTM, UNIVERSAL_VOCAB
+        from turing_machine.abbreviated import SkelotonCompiler
+    except:
+        from universal import EntryUTM, UNIVERSAL_VOCAB
+        from abbreviated import SkelotonCompiler
+
+    print("the universal machine compiled from hash-consed m-functions is already minimal")
+    with redirect_stdout(io.StringIO()):
+        SkelotonCompiler.reset()
+        SkelotonCompiler.set_vocab(set(UNIVERSAL_VOCAB))
+        utm = EntryUTM()
+        table = SkelotonCompiler.compile()
+    entry = SkelotonCompiler.get_m_config_name(utm)
+    minimal, start, renaming = minimize(table, entry)
+    print(f"{len(table.rules)} -> {len(minimal.rules)} rules")
+    assert all(old == new for old, new in renaming.items())
+
+
+def test_peephole():
+    print("cancel the inverse moves, drop the dead writes and the no-ops")
+    assert peephole(["L", "R", "x"]) == ["x"]
+    assert peephole(["x", "y", "R"]) == ["y", "R"]
+    assert peephole(["R", "x", "L", "R", "_", "N", "R"]) == ["R", "_", "R"]
+    assert peephole(["R", "R", "L", "L"]) == []
+    assert peephole(["0", "R", "L", "1", "L"]) == ["1", "L"]
+
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "*", ["R"], "d"))
+    table.add_rule(TransitionRule("d", "*", ["L", "R", "N"], "e"))
+    table.add_rule(TransitionRule("e", "_", ["1", "R"], "f"))
+    table.add_rule(TransitionRule("f", "*", ["R"], "b"))
+    fast, entry, weights = optimize(table, "b")
+    print(fast)
+    assert len(fast.rules) == 2
+    assert weights == {("b", "_"): 3, ("e", "_"): 2}
+
+
+def test_optimize_universal_machine():
+    import io
+    from contextlib import redirect_stdout
+
+    try:
+        from turing_machine.universal import EntryUTM, UNIVERSAL_VOCAB
+        from turing_machine.abbreviated import SkelotonCompiler
+        from turing_machine.encoding import Assembler
+        from turing_machine.compiled import CompiledTuringMachine
+    except:
+        from universal import EntryUTM, UNIVERSAL_VOCAB
+        from abbreviated import SkelotonCompiler
+        from encoding import Assembler
+        from compiled import CompiledTuringMachine
+
+    print("the optimized universal machine takes fewer steps to the same tape")
+    with redirect_stdout(io.StringIO()):
+        SkelotonCompiler.reset()
+        SkelotonCompiler.set_vocab(set(UNIVERSAL_VOCAB))
+        utm = EntryUTM()
+        table = SkelotonCompiler.compile()
+    entry = SkelotonCompiler.get_m_config_name(utm)
+    fast, start, weights = optimize(table, entry)
+
+    bcek_table = Table()
+    bcek_table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    bcek_table.add_rule(TransitionRule("c", "_", ["1", "R"], "b"))
+    instruction = Assembler(bcek_table, {"0", "1", "$"}, {"_", "x"}).standard_description
+
+    tm = CompiledTuringMachine(fast, start)
+    tm.set_history_policy("off")
+    tm.load_instruction(instruction)
+    profiler = tm.start_profiling()
+    tm.run(steps=20000)
+    steps = reference_steps(profiler, weights)
+
+    reference = CompiledTuringMachine(table, entry)
+    reference.set_history_policy("off")
+    reference.load_instruction(instruction)
+    reference.run(steps=steps)
+
+    assert reference.m_configuration == tm.m_configuration
+    assert reference.head_position == tm.head_position
+    tapes = ["".join(machine.get_tape()).rstrip("_") for machine in (reference, tm)]
+    assert tapes[0] == tapes[1]
+    print(f"{len(table.rules)} -> {len(fast.rules)} rules, {profiler.steps} steps for {steps} steps")
+
+
+if __name__ == "__main__":
+    test_minimize_table()
+    test_minimize_abbreviated()
+    test_minimize_universal_machine()
+    test_peephole()
+    test_optimize_universal_machine()
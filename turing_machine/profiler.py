@@ -0,0 +1,147 @@
+"""
+Profile a run of a Turing machine: which m-configurations and transitions use the steps.
+
+The profiler is an observer of the machine (see TuringMachine.observers), it counts:
+
+- the steps of every m-configuration
+- the steps of every transition (m-configuration, scanned symbol)
+- the head positions, in buckets of `bucket` squares
+- the growth events: (step, left end, right end) every time the head or a write goes
+  beyond the squares visited before
+
+Nothing is recorded (and nothing costs) until the profiler is attached with TuringMachine.start_profiling.
+The compiled engine reports a scan loop as one sweep event, the profiler expands it.
+
+The m-configurations of a table compiled by SkelotonCompiler are mapped back to the classes
+of the abbreviated tables (Find, CompareThenErase, MarkRightConfig, ...) through SkelotonCompiler.name2class,
+which is set both by SkelotonCompiler.compile and by a table loaded from the cache (cache.py).
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+from collections import Counter
+
+
+class Profiler:
+    def __init__(self, tm, bucket=1):
+        self.tm = tm
+        self.bucket = bucket
+        self.m_config = tm.current_state
+        self.head = tm.head_position
+        self.left = tm.min_left
+        self.right = tm.max_right
+        self.steps = 0
+        self.states = Counter()
+        self.transitions = Counter()
+        self.heads = Counter()
+        self.growth = []
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        scanned = None
+        left, right = head, head
+        for position, old, _ in writes:
+            if scanned is None and position == self.head:
+                scanned = old
+            left, right = min(left, position), max(right, position)
+        if scanned is None:
+            scanned = self.tm.tape[self.head]
+
+        self.steps += 1
+        self.states[self.m_config] += 1
+        self.transitions[(self.m_config, scanned)] += 1
+        self.heads[head // self.bucket] += 1
+        self.grow(left, right)
+        self.m_config, self.head = m_config, head
+        return False
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        tape = self.tm.tape
+        for position in range(head, head + count * move, move):
+            self.steps += 1
+            self.states[m_config] += 1
+            self.transitions[(m_config, tape[position])] += 1
+            self.heads[(position + move) // self.bucket] += 1
+            self.grow(position + move, position + move)
+        self.head = head + count * move
+        return False
+
+    def grow(self, left, right):
+        if left < self.left or right > self.right:
+            self.left, self.right = min(self.left, left), max(self.right, right)
+            self.growth.append((self.steps, self.left, self.right))
+
+    def report(self, name2class: dict = None, top=20):
+        """
+        the most used m-configurations, classes of abbreviated tables and transitions
+
+        name2class: m-configuration -> class name of the abbreviated table, SkelotonCompiler.name2class
+        """
+        names = name2class or {}
+        lines = [f"{self.steps} steps, {len(self.growth)} growth events"]
+
+        def percent(hits):
+            return f"{hits:>10} {100 * hits / max(self.steps, 1):6.2f}%"
+
+        lines.append("m-configurations:")
+        for state, hits in self.states.most_common(top):
+            lines.append(f"{percent(hits)}  {state} {names.get(state, '')}")
+
+        if names:
+            classes = Counter()
+            for state, hits in self.states.items():
+                classes[names.get(state, state)] += hits
+            lines.append("abbreviated tables:")
+            for name, hits in classes.most_common(top):
+                lines.append(f"{percent(hits)}  {name}")
+
+        lines.append("transitions:")
+        for (state, symbol), hits in self.transitions.most_common(top):
+            lines.append(f"{percent(hits)}  {state} {symbol} {names.get(state, '')}")
+        return "\n".join(lines)
+
+
+# Test Cases
+
+
+def test_profile_universal_machine():
+    try:
+        from turing_machine.op_extend import Table, TransitionRule
+        from turing_machine.abbreviated import SkelotonCompiler
+        from turing_machine.encoding import Assembler
+        from turing_machine.universal import create_universal_machine
+    except:
+        from op_extend import Table, TransitionRule
+        from abbreviated import SkelotonCompiler
+        from encoding import Assembler
+        from universal import create_universal_machine
+
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["1", "R"], "b"))
+    instruction = Assembler(table, {"0", "1", "$"}, {"_", "x"}).standard_description
+
+    profiles = []
+    for compiled in [False, True]:
+        tm = create_universal_machine(instruction, compiled=compiled)
+        tm.set_history_policy("off")
+        profiler = tm.start_profiling()
+        tm.run(steps=5000)
+        tm.stop_profiling()
+        tm.run(steps=100)
+        assert profiler.steps == 5000 == sum(profiler.states.values())
+        assert sum(profiler.transitions.values()) == sum(profiler.heads.values())
+        profiles.append(profiler)
+
+    profiler, compiled_profiler = profiles
+    assert profiler.states == compiled_profiler.states
+    assert profiler.transitions == compiled_profiler.transitions
+    assert profiler.heads == compiled_profiler.heads
+    assert profiler.growth == compiled_profiler.growth
+    print(profiler.report(SkelotonCompiler.name2class, top=8))
+
+
+if __name__ == "__main__":
+    test_profile_universal_machine()
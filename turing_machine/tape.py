@@ -0,0 +1,343 @@
+"""
+Bi-infinite tapes for the Turing machines.
+
+PagedTape is made of fixed-size pages.
+Pages are allocated on demand in both directions when a non-blank symbol is written,
+a blank region costs no memory, so a long run uses memory in proportion to the squares it touched.
+
+ByteTape is the compact representation: every symbol is interned to a one-byte code (SymbolTable)
+and the squares are stored in a bytearray which grows on both sides.
+Reading figures or loading a standard description (tape.load) are slice/translate operations on the bytearray,
+and the compiled engine (compiled.py) runs directly on it.
+
+Both tapes are indexed like a list:
+
+- tape[i] for any integer i (negative squares are on the left of the starting square)
+- tape[start:stop] or tape[start:stop:step], returns a list, start defaults to 0 and stop is required
+- tape[start:stop] = symbols, tape[start:stop:step] = symbols
+- tape.join(start, stop, step, exclude), the string of the symbols which are not excluded
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+import codecs
+
+PAGE_BITS = 10
+# the character of an undefined byte in a charmap decoding table
+UNDEFINED = "\ufffe"
+
+
+def decode_alphabet(data, alphabet, chars=None):
+    """
+    decode the bytes of data in one pass, without copying data first
+
+    data: any object with the buffer protocol (bytes, memoryview of a mmap ...)
+    alphabet: the characters which may be found in data, another byte raises UnicodeDecodeError
+    chars: the character every character of the alphabet is decoded to, itself by default
+    """
+    table = [UNDEFINED] * 256
+    for char, decoded in zip(alphabet, chars or alphabet):
+        table[ord(char)] = decoded
+    return codecs.charmap_decode(data, "strict", "".join(table))[0]
+
+
+
+class PagedTape:
+    def __init__(self, blank="_", page_bits=PAGE_BITS):
+        self.blank = blank
+        self.page_bits = page_bits
+        self.page_size = 1 << page_bits
+        self.mask = self.page_size - 1
+        self.pages = {}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.read(index)
+        page = self.pages.get(index >> self.page_bits)
+        if page is None:
+            return self.blank
+        return page[index & self.mask]
+
+    def __setitem__(self, index, symbol):
+        if isinstance(index, slice):
+            start = 0 if index.start is None else index.start
+            if index.step in (None, 1):
+                self.write(start, symbol)
+            elif len(symbol):
+                # read the squares in between, then write the whole range page by page
+                stop = start + (len(symbol) - 1) * index.step + 1
+                squares = self.read(slice(start, stop))
+                squares[:: index.step] = symbol
+                self.write(start, squares)
+            return
+        number = index >> self.page_bits
+        page = self.pages.get(number)
+        if page is None:
+            if symbol == self.blank:
+                return
+            page = self.pages[number] = [self.blank] * self.page_size
+        page[index & self.mask] = symbol
+
+    def read(self, index: slice):
+        start = 0 if index.start is None else index.start
+        stop = index.stop
+        assert stop is not None, "the tape is infinite, stop is required"
+        result = []
+        position = start
+        while position < stop:
+            number = position >> self.page_bits
+            offset = position & self.mask
+            end = min(stop - position, self.page_size - offset) + offset
+            page = self.pages.get(number)
+            if page is None:
+                result.extend([self.blank] * (end - offset))
+            else:
+                result.extend(page[offset:end])
+            position += end - offset
+        if index.step not in (None, 1):
+            return result[:: index.step]
+        return result
+
+    def write(self, start, symbols):
+        """write symbols from start, pages which would stay blank are not allocated"""
+        position = start
+        i = 0
+        while i < len(symbols):
+            number = position >> self.page_bits
+            offset = position & self.mask
+            n = min(len(symbols) - i, self.page_size - offset)
+            chunk = symbols[i : i + n]
+            page = self.pages.get(number)
+            if page is None:
+                if all(symbol == self.blank for symbol in chunk):
+                    position += n
+                    i += n
+                    continue
+                page = self.pages[number] = [self.blank] * self.page_size
+            page[offset : offset + n] = chunk
+            position += n
+            i += n
+
+    def load(self, start, step, data: bytes, alphabet: str):
+        """
+        write the ASCII characters of data on every step-th square from start,
+        UnicodeDecodeError if data has a character which is not in the alphabet
+        """
+        symbols = decode_alphabet(data, alphabet)
+        self[start : start + len(symbols) * step : step] = list(symbols)
+
+    def join(self, start, stop, step=1, exclude=()):
+        return "".join(
+            symbol
+            for symbol in self.read(slice(start, stop, step))
+            if symbol not in exclude
+        )
+
+    def bounds(self):
+        """(first, last + 1) of the allocated squares, (0, 0) for a blank tape"""
+        if not self.pages:
+            return 0, 0
+        return (
+            min(self.pages) << self.page_bits,
+            (max(self.pages) + 1) << self.page_bits,
+        )
+
+    def __len__(self):
+        """number of allocated squares"""
+        return len(self.pages) * self.page_size
+
+
+class SymbolTable:
+    """
+    one-byte codes of the symbols, the blank is 0
+    """
+
+    def __init__(self, blank="_"):
+        self.symbols = []
+        self.codes = {}
+        self.chars = bytearray(256)
+        self.single = True
+        self.intern(blank)
+
+    def intern(self, symbol):
+        code = self.codes.get(symbol)
+        if code is None:
+            assert len(self.symbols) < 256, "too many symbols for a byte tape"
+            code = self.codes[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            if len(symbol) == 1 and ord(symbol) < 256:
+                self.chars[code] = ord(symbol)
+            else:
+                self.single = False
+        return code
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def encode(self, symbols):
+        """a string or a list of symbols to codes"""
+        if isinstance(symbols, str) and symbols.isascii():
+            table = bytearray(range(256))
+            for char in set(symbols):
+                table[ord(char)] = self.intern(char)
+            return symbols.encode("ascii").translate(table)
+        return bytes(self.intern(symbol) for symbol in symbols)
+
+    def decode(self, codes):
+        """codes to a list of symbols"""
+        if self.single:
+            return list(bytes(codes).translate(self.chars).decode("latin-1"))
+        symbols = self.symbols
+        return [symbols[code] for code in codes]
+
+    def decode_str(self, codes):
+        if self.single:
+            return bytes(codes).translate(self.chars).decode("latin-1")
+        return "".join(self.decode(codes))
+
+
+class ByteTape:
+    """
+    buffer[origin] is the square 0, the squares outside the buffer are blank (code 0)
+
+    The buffer is a bytearray, or a copy-on-write mmap of a checkpoint (see checkpoint.py)
+    which is copied to a bytearray the first time it grows.
+    """
+
+    def __init__(self, symbols: SymbolTable = None, blank="_", size=64):
+        self.symbols = symbols if symbols is not None else SymbolTable(blank)
+        self.blank = self.symbols.symbols[0]
+        self.buffer = bytearray(size)
+        self.origin = 0
+
+    def reserve(self, start, stop):
+        """grow the buffer (at least doubling) to hold the squares start..stop-1"""
+        size = len(self.buffer)
+        if stop + self.origin > size:
+            self.grow(0, max(size, stop + self.origin - size))
+        if start + self.origin < 0:
+            self.grow(max(len(self.buffer), -(start + self.origin)), 0)
+
+    def grow(self, left, right):
+        """add blank squares on both sides of the buffer, return the new buffer"""
+        if not isinstance(self.buffer, bytearray):
+            self.buffer = bytearray(self.buffer)
+        if right:
+            self.buffer.extend(bytes(right))
+        if left:
+            self.buffer[0:0] = bytes(left)
+            self.origin += left
+        return self.buffer
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.symbols.decode(self.codes(index))
+        index += self.origin
+        if 0 <= index < len(self.buffer):
+            return self.symbols.symbols[self.buffer[index]]
+        return self.blank
+
+    def codes(self, index: slice):
+        """the codes of a slice of squares"""
+        start = 0 if index.start is None else index.start
+        stop = index.stop
+        assert stop is not None, "the tape is infinite, stop is required"
+        step = 1 if index.step is None else index.step
+        if stop <= start:
+            return bytearray()
+        size = len(self.buffer)
+        lo, hi = start + self.origin, stop + self.origin
+        if 0 <= lo and hi <= size:
+            return self.buffer[lo:hi:step]
+        left = min(max(-lo, 0), hi - lo)
+        right = min(max(hi - size, 0), hi - lo)
+        inner = self.buffer[max(lo, 0) : max(min(hi, size), 0)]
+        codes = bytearray(left) + inner + bytearray(right)
+        return codes[::step]
+
+    def __setitem__(self, index, symbol):
+        if isinstance(index, slice):
+            start = 0 if index.start is None else index.start
+            step = 1 if index.step is None else index.step
+            codes = self.symbols.encode(symbol)
+            if not codes:
+                return
+            stop = start + (len(codes) - 1) * step + 1
+            self.reserve(start, stop)
+            start += self.origin
+            self.buffer[start : stop + self.origin : step] = codes
+            return
+        code = self.symbols.intern(symbol)
+        self.reserve(index, index + 1)
+        self.buffer[index + self.origin] = code
+
+    def load(self, start, step, data: bytes, alphabet: str):
+        """
+        write the ASCII characters of data on every step-th square from start,
+        checked and translated to codes in one pass over data, then copied to the buffer in one strided assignment
+
+        data: bytes, bytearray or any object with the buffer protocol (e.g. a memoryview of a mmap)
+        alphabet: the characters which may be found in data, another character raises UnicodeDecodeError
+        """
+        chars = [chr(self.symbols.intern(char)) for char in alphabet]
+        codes = decode_alphabet(data, alphabet, chars).encode("latin-1")
+        if not codes:
+            return
+        stop = start + (len(codes) - 1) * step + 1
+        self.reserve(start, stop)
+        self.buffer[start + self.origin : stop + self.origin : step] = codes
+
+    def join(self, start, stop, step=1, exclude=()):
+        codes = self.codes(slice(start, stop, step))
+        delete = bytes(
+            self.symbols.codes[symbol]
+            for symbol in exclude
+            if symbol in self.symbols.codes
+        )
+        return self.symbols.decode_str(codes.translate(None, delete))
+
+    def bounds(self):
+        """(first, last + 1) of the squares in the buffer"""
+        return -self.origin, len(self.buffer) - self.origin
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+# Test Cases
+
+
+def test_paged_tape():
+    tape = PagedTape("_", page_bits=2)
+    tape[0:6] = ["$", "$", "0", "_", "1", "_"]
+    tape[-3] = "x"
+    tape[100] = "_"
+    assert tape[-4:7] == ["_", "x", "_", "_", "$", "$", "0", "_", "1", "_", "_"]
+    assert tape[0:7:2] == ["$", "0", "1", "_"]
+    assert tape[-1000] == "_"
+    assert sorted(tape.pages) == [-1, 0, 1], "blank writes should not allocate"
+    assert tape.bounds() == (-4, 8)
+    print("paged tape:", "".join(tape[-4:8]))
+
+
+def test_byte_tape():
+    tape = ByteTape(size=4)
+    tape[0:6] = ["$", "$", "0", "_", "1", "_"]
+    tape[-3] = "x"
+    tape[8:13:2] = "DAC"
+    tape[14] = "::"
+    assert tape[-4:7] == ["_", "x", "_", "_", "$", "$", "0", "_", "1", "_", "_"]
+    assert tape[0:7:2] == ["$", "0", "1", "_"]
+    assert tape[-1000] == "_" and tape[1000] == "_"
+    assert tape.join(0, 15, 2, exclude={"$", "_"}) == "01DAC::"
+    assert tape.buffer[tape.origin] == tape.symbols.codes["$"]
+    assert tape[-200:-198] == ["_", "_"] and tape[200:203:2] == ["_", "_"]
+    print("byte tape:", "".join(tape[-4:15]))
+
+
+if __name__ == "__main__":
+    test_paged_tape()
+    test_byte_tape()
@@ -0,0 +1,352 @@
+"""
+Binary traces of a Turing machine, written while it runs and read back offline.
+
+run(verbose=True) formats and prints the complete configuration after every step,
+a traced run is then bound by the console. TraceSink is an observer of the machine
+(see TuringMachine.observers) which writes fixed-size records through a buffered file:
+
+    header   MAGIC, size of the metadata, pickle of the first configuration
+             (m-configuration, head, min_left, max_right, fill_len, tape)
+    records  struct RECORD: step, state, scanned, written, head, left, right, move
+    trailer  pickle of the names of the states and symbols, then its size (struct SIZE)
+
+Two kinds of records share the layout:
+
+- step record: the m-configuration (id) after the step `step`, the scanned symbol before the step,
+  the last symbol written (NONE if none), the head after the step, the left and right ends
+  of the visited squares and the move of the head (-1, 0 or 1)
+- write record (state = WRITE): the symbol `scanned` at square `head` is replaced by `written`
+  during the step `step`
+
+Sampling (every Nth step, a range of steps, the m-configurations matching a regular expression)
+only drops step records, the write records are always kept, so read_trace can rebuild
+the tape and the str() line of every sampled step.
+
+A scan loop of the compiled engine is one sweep event, the sink expands it.
+
+The trailer is written by TuringMachine.stop_trace, and by run when it raises
+(e.g. NoTransitionError when the machine halts), so the trace of a failed run can be read.
+
+Tracing every step is not free: the sqrt(2) machine on the interpreter runs 200000 steps
+in about 0.4s, and in 0.55s to 0.8s with a trace (1.5 to 2 times), see test_trace_overhead.
+The metadata is a pickle: only read traces you wrote.
+
+
+Author: Metaesc
+Email: metaescape@foxmail.com
+License: MIT License
+"""
+
+import pickle
+import re
+import struct
+
+MAGIC = b"TMTR"
+SIZE = struct.Struct("<Q")
+RECORD = struct.Struct("<QIHHiiib")
+WRITE = 0xFFFFFFFF
+NONE = 0xFFFF
+
+
+class TraceSink:
+    def __init__(
+        self, tm, path, every=1, steps=None, states=None, buffering=1 << 20
+    ):
+        """
+        every: keep one step out of `every`
+        steps: keep only the steps in this range, e.g. range(1000, 2000)
+        states: keep only the m-configurations matching this regular expression
+        """
+        self.tm = tm
+        self.every = every
+        self.steps = steps
+        self.pattern = None if states is None else re.compile(states)
+        self.state_ids = {}
+        self.state_names = []
+        self.matches = []
+        self.symbol_ids = {}
+        self.symbol_names = []
+        self.step = tm.step_count
+        self.head = tm.head_position
+        self.left = tm.min_left
+        self.file = open(path, "wb", buffering=buffering)
+        metadata = pickle.dumps(
+            {
+                "m_config": tm.current_state,
+                "head": tm.head_position,
+                "min_left": tm.min_left,
+                "max_right": tm.max_right,
+                "fill_len": tm.fill_len,
+                "step": tm.step_count,
+                "tape": tm.get_tape(),
+            }
+        )
+        self.file.write(MAGIC + SIZE.pack(len(metadata)) + metadata)
+
+    def state_id(self, m_config):
+        state = self.state_ids.get(m_config)
+        if state is None:
+            state = self.state_ids[m_config] = len(self.state_names)
+            self.state_names.append(m_config)
+            self.matches.append(
+                self.pattern is None or bool(self.pattern.search(str(m_config)))
+            )
+        return state
+
+    def symbol_id(self, symbol):
+        code = self.symbol_ids.get(symbol)
+        if code is None:
+            code = self.symbol_ids[symbol] = len(self.symbol_names)
+            self.symbol_names.append(symbol)
+        return code
+
+    def sampled(self, step, state):
+        if step % self.every:
+            return False
+        if self.steps is not None and step not in self.steps:
+            return False
+        return self.matches[state]
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        step = self.step = self.step + 1
+        ids = self.symbol_ids
+        pack = RECORD.pack
+        scanned = written = None
+        for position, old, new in writes:
+            if scanned is None and position == self.head:
+                scanned = old
+            written = ids.get(new)
+            if written is None:
+                written = self.symbol_id(new)
+            code = ids.get(old)
+            if code is None:
+                code = self.symbol_id(old)
+            self.file.write(pack(step, WRITE, code, written, position, 0, 0, 0))
+            if position < self.left:
+                self.left = position
+        if scanned is None:
+            scanned = self.tm.tape[self.head]
+        if head < self.left:
+            self.left = head
+        state = self.state_ids.get(m_config)
+        if state is None:
+            state = self.state_id(m_config)
+        if self.sampled(step, state):
+            code = ids.get(scanned)
+            if code is None:
+                code = self.symbol_id(scanned)
+            move = (head > self.head) - (head < self.head)
+            self.file.write(
+                pack(
+                    step,
+                    state,
+                    code,
+                    NONE if written is None else written,
+                    head,
+                    self.left,
+                    max_right,
+                    move,
+                )
+            )
+        self.head = head
+        return False
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        state = self.state_id(m_config)
+        tape = self.tm.tape
+        left = self.left
+        first = self.step + 1
+        self.step += count
+        self.head = head + count * move
+        self.left = min(self.left, self.head)
+        if not self.matches[state]:
+            return False
+        start = first + (-first) % self.every
+        for step in range(start, self.step + 1, self.every):
+            if self.steps is not None and step not in self.steps:
+                continue
+            position = head + (step - first) * move
+            self.file.write(
+                RECORD.pack(
+                    step,
+                    state,
+                    self.symbol_id(tape[position]),
+                    NONE,
+                    position + move,
+                    min(left, position + move),
+                    max(max_right, position + move),
+                    move,
+                )
+            )
+        return False
+
+    def close(self):
+        if self.file.closed:
+            return
+        trailer = pickle.dumps(
+            {"states": self.state_names, "symbols": self.symbol_names}
+        )
+        self.file.write(trailer + SIZE.pack(len(trailer)))
+        self.file.close()
+
+
+def read_records(path):
+    """
+    the metadata of the first configuration, the names and an iterator over the raw records
+    """
+    f = open(path, "rb")
+    if f.read(len(MAGIC)) != MAGIC:
+        f.close()
+        raise Exception(f"{path} is not a trace")
+    (size,) = SIZE.unpack(f.read(SIZE.size))
+    metadata = pickle.loads(f.read(size))
+    start = f.tell()
+    f.seek(-SIZE.size, 2)
+    (size,) = SIZE.unpack(f.read(SIZE.size))
+    end = f.seek(-SIZE.size - size, 2)
+    names = pickle.loads(f.read(size))
+
+    def records():
+        with f:
+            f.seek(start)
+            remaining = end - start
+            chunk = RECORD.size * 4096
+            while remaining:
+                data = f.read(min(chunk, remaining))
+                remaining -= len(data)
+                yield from RECORD.iter_unpack(data)
+
+    return metadata, names, records()
+
+
+def read_trace(path):
+    """
+    yield (step, line) for every sampled step,
+    line is the str() of the machine after the step, as printed by run(verbose=True)
+    """
+    metadata, names, records = read_records(path)
+    states, symbols = names["states"], names["symbols"]
+    fill_len = metadata["fill_len"]
+    tape = {}
+    for i, symbol in enumerate(metadata["tape"]):
+        tape[metadata["min_left"] + i] = symbol
+    for step, state, scanned, written, head, left, right, move in records:
+        if state == WRITE:
+            tape[head] = symbols[written]
+            continue
+        squares = [tape.get(position, "_") for position in range(left, right + 1)]
+        squares[head - left] = f"[{squares[head - left]}]"
+        yield step, f"{states[state]:>{fill_len}} | {''.join(squares)}"
+
+
+# Test Cases
+
+
+def live_lines(tm, steps):
+    """(step, str()) after every step, what run(verbose=True) prints"""
+    lines = []
+    for _ in range(steps):
+        tm.run(steps=1)
+        lines.append((tm.step_count, tm.str()))
+    return lines
+
+
+def test_trace_sqrt2():
+    import os
+    import tempfile
+
+    try:
+        from turing_machine.op_extend import TuringMachine, create_sqrt2_table
+        from turing_machine.compiled import CompiledTuringMachine
+    except:
+        from op_extend import TuringMachine, create_sqrt2_table
+        from compiled import CompiledTuringMachine
+
+    expected = live_lines(TuringMachine(create_sqrt2_table(), "begin"), 3000)
+    path = os.path.join(tempfile.mkdtemp(), "sqrt2.trace")
+    for machine in [TuringMachine, CompiledTuringMachine]:
+        tm = machine(create_sqrt2_table(), "begin")
+        tm.set_history_policy("off")
+        tm.start_trace(path)
+        tm.run(steps=3000)
+        tm.stop_trace()
+        assert list(read_trace(path)) == expected, machine.__name__
+
+        tm = machine(create_sqrt2_table(), "begin")
+        tm.set_history_policy("off")
+        tm.start_trace(path, every=7, steps=range(500, 2000), states="^(mark|find)")
+        tm.run(steps=3000)
+        tm.stop_trace()
+        sampled = [
+            (step, line)
+            for step, line in expected
+            if step % 7 == 0
+            and 500 <= step < 2000
+            and line.split()[0].startswith(("mark", "find"))
+        ]
+        assert sampled and list(read_trace(path)) == sampled, machine.__name__
+    print(f"{len(sampled)} sampled steps, {os.path.getsize(path)} bytes")
+
+
+def test_trace_overhead():
+    import os
+    import tempfile
+    import time
+
+    try:
+        from turing_machine.op_extend import TuringMachine, create_sqrt2_table
+    except:
+        from op_extend import TuringMachine, create_sqrt2_table
+
+    path = os.path.join(tempfile.mkdtemp(), "sqrt2.trace")
+    timings = []
+    for traced in [False, True]:
+        tm = TuringMachine(create_sqrt2_table(), "begin")
+        tm.set_history_policy("off")
+        if traced:
+            tm.start_trace(path)
+        start = time.perf_counter()
+        tm.run(steps=200000)
+        timings.append(time.perf_counter() - start)
+        tm.stop_trace()
+    size = os.path.getsize(path)
+    print(f"200000 steps: {timings[0]:.2f}s, traced {timings[1]:.2f}s, {size} bytes")
+    # 1.5 to 2 times, the bound leaves room for a noisy machine
+    assert timings[1] < 3 * timings[0], timings
+
+
+def test_trace_halted_machine():
+    import os
+    import tempfile
+
+    try:
+        from turing_machine.op_extend import (
+            Table,
+            TransitionRule,
+            TuringMachine,
+            NoTransitionError,
+        )
+        from turing_machine.compiled import CompiledTuringMachine
+    except:
+        from op_extend import Table, TransitionRule, TuringMachine, NoTransitionError
+        from compiled import CompiledTuringMachine
+
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["1", "R"], "d"))
+    path = os.path.join(tempfile.mkdtemp(), "halted.trace")
+    for machine in [TuringMachine, CompiledTuringMachine]:
+        tm = machine(table, "b")
+        tm.start_trace(path)
+        try:
+            tm.run(steps=10)
+        except NoTransitionError:
+            pass
+        assert tm.trace is None
+        assert [step for step, _ in read_trace(path)] == [1, 2], machine.__name__
+
+
+if __name__ == "__main__":
+    test_trace_sqrt2()
+    test_trace_overhead()
+    test_trace_halted_machine()
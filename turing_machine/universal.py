@@ -9,13 +9,24 @@ There are different universal machines for different types of encoding.
 
 The universal machine in this script is designed for interpreting the standard encoding of the transition table.
 
+EntryUTM keeps every complete configuration on the tape, as in the paper,
+EntryReclaimUTM erases the old ones, so its tape only grows with the printed figures.
+
 Author: Metaesc
 Email: metaescape@foxmail.com
 License: MIT License
 """
 
+import re
+from itertools import chain
+
 try:
-    from turing_machine.op_extend import Table, TransitionRule, TuringMachine
+    from turing_machine.op_extend import (
+        Table,
+        TransitionRule,
+        TuringMachine,
+        NoTransitionError,
+    )
     from turing_machine.abbreviated import (
         SkelotonCompiler,
         Find,
@@ -29,10 +40,13 @@ try:
         PrintEndTwo,
         CopyThenEraseThree,
         CopyThenEraseTwo,
+        Replace,
     )
     from turing_machine.encoding import Assembler
+    from turing_machine.compiled import CompiledTuringMachine
+    from turing_machine.cache import compile_abbreviated
 except:
-    from op_extend import Table, TransitionRule, TuringMachine
+    from op_extend import Table, TransitionRule, TuringMachine, NoTransitionError
     from abbreviated import (
         SkelotonCompiler,
         Find,
@@ -46,8 +60,11 @@ except:
         PrintEndTwo,
         CopyThenEraseThree,
         CopyThenEraseTwo,
+        Replace,
     )
     from encoding import Assembler
+    from compiled import CompiledTuringMachine
+    from cache import compile_abbreviated
 
 
 class MarkRightConfig(AbbreviatedTable):
@@ -80,20 +97,26 @@ class MarkRightConfig2(AbbreviatedTable):
 class EntryUTM(AbbreviatedTable):
     """
     the fisrt state of the universal machine
+
+    reclaim: optional, the m-function which the machine enters after it writes a complete configuration,
+    Reclaim erases the configuration before it (see EntryReclaimUTM),
+    every state of the cycle passes it on to the next one
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition("*", "R", Find(EntryUTM1(), EntryUTM1(), "::"))
+        self.add_transition(
+            "*", "R", Find(EntryUTM1(*reclaim), EntryUTM1(*reclaim), "::")
+        )
 
 
 class EntryUTM1(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         self.add_transition(
             "*",
             ["R", "R", ":", "R", "R", "D", "R", "R", "A"],
-            MarkLastConfig(),
+            MarkLastConfig(*reclaim),
         )  # print q1 state to tape,so this should be the first state of any machine
 
 
@@ -102,15 +125,15 @@ class MarkLastConfig(AbbreviatedTable):
     anf state in the paper
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.set_alias(FindRight(MarkLastConfig1(), ":"))
+        self.set_alias(FindRight(MarkLastConfig1(*reclaim), ":"))
 
 
 class MarkLastConfig1(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.set_alias(MarkRightConfig(MarkNextConfig(), "y"))
+        self.set_alias(MarkRightConfig(MarkNextConfig(*reclaim), "y"))
 
 
 class MarkNextConfig(AbbreviatedTable):
@@ -118,10 +141,12 @@ class MarkNextConfig(AbbreviatedTable):
     kom state in the paper
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         self.add_transition(
-            ";", ["R", "z", "L"], MarkRightConfig(CompareXYSequence(), "x")
+            ";",
+            ["R", "z", "L"],
+            MarkRightConfig(CompareXYSequence(*reclaim), "x"),
         )
         self.add_transition("z", ["L", "L"], self)
         self.add_transition("*", ["L"], self)
@@ -130,11 +155,14 @@ class MarkNextConfig(AbbreviatedTable):
 class CompareXYSequence(AbbreviatedTable):
     """kmp state in the paper"""
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         self.set_alias(
             CompareThenErase(
-                Erase(Erase(MarkLastConfig(), "x"), "y"), SAME(), "x", "y"
+                Erase(Erase(MarkLastConfig(*reclaim), "x"), "y"),
+                SAME(*reclaim),
+                "x",
+                "y",
             )
         )
 
@@ -144,36 +172,38 @@ class SAME(AbbreviatedTable):
     mark next-m-configuration in the instruction with y
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.set_alias(FindThenLeft(SAME1(), SAME2(), "z"))
+        self.set_alias(FindThenLeft(SAME1(*reclaim), SAME2(*reclaim), "z"))
 
 
 class SAME1(AbbreviatedTable):
     """sim1 state in the paper"""
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.set_alias(MarkRightConfig(SAME2(), ""))
+        self.set_alias(MarkRightConfig(SAME2(*reclaim), ""))
 
 
 class SAME2(AbbreviatedTable):
     """sim2 state in the paper"""
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition("A", [], SAME3())
+        self.add_transition("A", [], SAME3(*reclaim))
         self.add_transition("*", ["L", "u", "R", "R", "R"], self)
 
 
 class SAME3(AbbreviatedTable):
     """sim3 state in the paper"""
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
 
         self.add_transition("A", ["L", "y", "R", "R", "R"], self)
-        self.add_transition("*", ["L", "y"], Erase(MarkLastFullConfig(), "z"))
+        self.add_transition(
+            "*", ["L", "y"], Erase(MarkLastFullConfig(*reclaim), "z")
+        )
 
 
 class MarkLastFullConfig(AbbreviatedTable):
@@ -184,17 +214,17 @@ class MarkLastFullConfig(AbbreviatedTable):
 
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.set_alias(FindRight(MarkLastFullConfig1(), ":"))
+        self.set_alias(FindRight(MarkLastFullConfig1(*reclaim), ":"))
 
 
 class MarkLastFullConfig1(AbbreviatedTable):
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         self.add_transition(
-            "A", ["L"] * 4, MarkLastFullConfig2()
+            "A", ["L"] * 4, MarkLastFullConfig2(*reclaim)
         )  # find c-config
         self.add_transition("*", ["R"] * 2, self)
 
@@ -204,12 +234,12 @@ class MarkLastFullConfig2(AbbreviatedTable):
     mark the first DCCC.. to the left of m-configuation and current symbol in the last complete configuration with x
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         self.add_transition("C", ["R", "x", "L", "L", "L"], self)
-        self.add_transition(":", [], MarkLastFullConfig4())
+        self.add_transition(":", [], MarkLastFullConfig4(*reclaim))
         self.add_transition(
-            "D", ["R", "x", "L", "L", "L"], MarkLastFullConfig3()
+            "D", ["R", "x", "L", "L", "L"], MarkLastFullConfig3(*reclaim)
         )
 
 
@@ -218,17 +248,17 @@ class MarkLastFullConfig3(AbbreviatedTable):
     Mark the remain DCC.. to the left o m-configuation in the last complete configuration with v
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition(":", [], MarkLastFullConfig4())
+        self.add_transition(":", [], MarkLastFullConfig4(*reclaim))
         self.add_transition("*", ["R", "v", "L", "L", "L"], self)
 
 
 class MarkLastFullConfig4(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         self.set_alias(
-            MarkRightConfig(Left(Left(MarkLastFullConfig5())), "")
+            MarkRightConfig(Left(Left(MarkLastFullConfig5(*reclaim))), "")
         )  # skip the m-config and current symbol
 
 
@@ -237,9 +267,9 @@ class MarkLastFullConfig5(AbbreviatedTable):
     Mark all the DCC.. sybmol to the right of m-configuration and current symbol in last complete configuration with w
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition("_", [":"], Print0or1())
+        self.add_transition("_", [":"], Print0or1(*reclaim))
         self.add_transition("*", ["R", "w", "R"], self)
 
 
@@ -249,46 +279,46 @@ class Print0or1(AbbreviatedTable):
     go back to instruction section, if 1 or 0 is Printed in the  instruction, print it to the end of complete configuration
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.set_alias(Find(Print0or1_1(), Inst(), "u"))
+        self.set_alias(Find(Print0or1_1(*reclaim), Inst(*reclaim), "u"))
 
 
 class Print0or1_1(AbbreviatedTable):
     """ """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         # goto the last square of scanned symbol in  the instruction
-        self.add_transition("*", ["L"] * 3, Print0or1_2())
+        self.add_transition("*", ["L"] * 3, Print0or1_2(*reclaim))
 
 
 class Print0or1_2(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition("D", ["R"] * 4, Print0or1_3())
-        self.add_transition("*", [], Inst())
+        self.add_transition("D", ["R"] * 4, Print0or1_3(*reclaim))
+        self.add_transition("*", [], Inst(*reclaim))
 
 
 class Print0or1_3(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition("C", ["R"] * 2, Print0or1_4())
-        self.add_transition("*", [], Inst())
+        self.add_transition("C", ["R"] * 2, Print0or1_4(*reclaim))
+        self.add_transition("*", [], Inst(*reclaim))
 
 
 class Print0or1_4(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition("C", ["R"] * 2, Print0or1_5())
-        self.add_transition("*", [], PrintEndTwo(Inst(), "0", ":"))
+        self.add_transition("C", ["R"] * 2, Print0or1_5(*reclaim))
+        self.add_transition("*", [], PrintEndTwo(Inst(*reclaim), "0", ":"))
 
 
 class Print0or1_5(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        self.add_transition("C", ["R"] * 2, Print0or1_5())
-        self.add_transition("*", [], PrintEndTwo(Inst(), "1", ":"))
+        self.add_transition("C", ["R"] * 2, Print0or1_5(*reclaim))
+        self.add_transition("*", [], PrintEndTwo(Inst(*reclaim), "1", ":"))
 
 
 class Inst(AbbreviatedTable):
@@ -296,16 +326,18 @@ class Inst(AbbreviatedTable):
     inst state in the paper, create a new complete configuration base on the instruction and last complete configuration
     """
 
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
         # find the action in the instruction
-        self.set_alias(FindRight(Left(Inst1()), "u"))
+        self.set_alias(FindRight(Left(Inst1(*reclaim)), "u"))
 
 
 class Inst1(AbbreviatedTable):
-    def __init__(self):
+    def __init__(self, *reclaim):
         super().__init__()
-        clean_and_restart = EraseAllMark(MarkLastConfig())
+        clean_and_restart = EraseAllMark(MarkLastConfig(*reclaim))
+        for m_function in reclaim:
+            clean_and_restart = m_function(clean_and_restart)
         self.add_transition(
             "L",
             ["R", "_"],
@@ -331,6 +363,312 @@ class CopyThenEraseFive(AbbreviatedTable):
         )
 
 
+class EntryReclaimUTM(AbbreviatedTable):
+    """
+    the universal machine which keeps only the last complete configuration:
+
+        $$;DADDCRDAA;DAADDCCRDA:::0:1:0:DCDCDCDAD
+
+    after "::" the printed figures are kept, each after a ":", then the last complete configuration,
+    so the tape is not longer than the instruction, the figures and two complete configurations
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.set_alias(EntryUTM(Reclaim))
+
+
+class Reclaim(AbbreviatedTable):
+    """
+    the tape is ...:: (:figure)* :old-config: (figure:) new-config
+
+    replace the old complete configuration (the first D after "::") and the ":" after it with "-",
+    mark the squares behind them with x, then shift the marked squares to the left over the "-"
+    """
+
+    def __init__(self, success):
+        super().__init__()
+        self.set_alias(Find(Reclaim1(success), success, "::"))
+
+
+class Reclaim1(AbbreviatedTable):
+    def __init__(self, success):
+        super().__init__()
+        self.add_transition("D", [], Reclaim2(success))
+        self.add_transition("*", ["R", "R"], self)
+
+
+class Reclaim2(AbbreviatedTable):
+    def __init__(self, success):
+        super().__init__()
+        self.add_transition(":", ["-", "R", "R"], Reclaim3(success))
+        self.add_transition("*", ["-", "R", "R"], self)
+
+
+class Reclaim3(AbbreviatedTable):
+    def __init__(self, success):
+        super().__init__()
+        self.add_transition("_", [], ShiftLeft(Trim(success, "-"), "x", "-"))
+        self.add_transition("*", ["R", "x", "R"], self)
+
+
+class ShiftLeft(AbbreviatedTable):
+    """
+    move the figures marked by x, from the first one, to the first square with the figure beta,
+    and print beta where they were
+    """
+
+    def __init__(self, success, x, beta):
+        super().__init__()
+        self.set_alias(FindThenLeft(ShiftLeft1(success, x, beta), success, x))
+
+
+class ShiftLeft1(AbbreviatedTable):
+    def __init__(self, success, x, beta):
+        super().__init__()
+        shift = ShiftLeft(success, x, beta)
+        for alpha in sorted(SkelotonCompiler.vocab):
+            self.add_transition(
+                alpha,
+                [beta, "R", "_"],
+                Replace(shift, shift, beta, alpha),
+            )
+
+
+class Trim(AbbreviatedTable):
+    """
+    erase the figures beta from the first one until another figure
+    """
+
+    def __init__(self, success, beta):
+        super().__init__()
+        self.set_alias(Find(Trim1(success, beta), success, beta))
+
+
+class Trim1(AbbreviatedTable):
+    def __init__(self, success, beta):
+        super().__init__()
+        self.add_transition(beta, ["_", "R", "R"], self)
+        self.add_transition("*", [], success)
+
+
+STANDARD_RULE = re.compile(r";(DA+)(DC*)(DC*)([LRN])(DA+)")
+
+
+class FastUniversalMachine:
+    """
+    Semantic fast-path of the universal machine.
+
+    The tape of the universal machine is the standard description on the F-squares,
+    then "::" and the encoded complete configurations separated by ":",
+    with the figure "0" or "1" and another ":" after a step which prints a figure:
+
+        $$;DADDCRDAA;DAADDCCRDA:::DAD:0:DCDAAD:1:DCDCCDAD ...
+
+    Here the 5-tuples are decoded once and the machine they describe runs directly
+    on a list of symbol numbers (DC^j is j), one step per complete configuration.
+    The configurations are only encoded when they are read (configurations, get_sequence, get_tape):
+    they are rebuilt by running the decoded machine again from the start.
+
+    The fast-path keeps the behaviors of the universal machine which differ from the described machine:
+
+    - the instructions are tried from the last one, and CompareThenErase stops when the marks of
+      the instruction are used up, so DA^i DC^j matches the m-configuration DA^i scanning DC^j' for any j' >= j
+    - Print0or1 only prints the figure ("0" for DC, "1" for DCC...) when the instruction scans a blank (D)
+    - a move to the left from the first square does not move
+    - a configuration whose head is beyond its last square ends with the m-configuration,
+      the blank "D" is added when the next configuration is computed
+
+    When no instruction matches, the universal machine moves to the left forever,
+    the fast-path raises NoTransitionError.
+    """
+
+    def __init__(self, instruction):
+        instruction = "".join(instruction)
+        if not re.fullmatch(f"(?:{STANDARD_RULE.pattern})+", instruction):
+            raise Exception(f"not a standard description: {instruction}")
+        self.instruction = instruction
+        self.instructions = []
+        for m_config, symbol, printed, move, next_m_config in STANDARD_RULE.findall(
+            instruction
+        ):
+            self.instructions.append(
+                (
+                    len(m_config) - 1,
+                    len(symbol) - 1,
+                    len(printed) - 1,
+                    move,
+                    len(next_m_config) - 1,
+                )
+            )
+        self.rules = {}
+        self.step_count = 0
+        self.figures = []
+        self.reset()
+
+    def reset(self):
+        """the first complete configuration: m-configuration q1 on a blank tape"""
+        self.left, self.m_config, self.right = [], 1, []
+
+    def match(self, m_config, scanned):
+        """
+        the printed symbol, move, next m-configuration and figure
+        of the first instruction the universal machine accepts, None if there is no one
+        """
+        key = (m_config, scanned)
+        if key not in self.rules:
+            self.rules[key] = None
+            for i, symbol, printed, move, next_m_config in reversed(self.instructions):
+                if i == m_config and symbol <= scanned:
+                    figure = None
+                    if symbol == 0 and printed > 0:
+                        figure = "0" if printed == 1 else "1"
+                    self.rules[key] = (printed, move, next_m_config, figure)
+                    break
+        return self.rules[key]
+
+    def step(self):
+        """
+        one step of the described machine, return the figure printed on the tape of
+        the universal machine ("0", "1" or None)
+        """
+        left, right = self.left, self.right
+        scanned = right[0] if right else 0
+        rule = self.match(self.m_config, scanned)
+        if rule is None:
+            raise NoTransitionError(
+                f"No instruction for DA{'A' * (self.m_config - 1)} scanning D{'C' * scanned}"
+            )
+        printed, move, self.m_config, figure = rule
+        del right[:1]
+        if move == "R":
+            left.append(printed)
+        elif move == "L" and left:
+            right[:0] = [left.pop(), printed]
+        else:
+            right.insert(0, printed)
+        return figure
+
+    def run(self, steps=1000):
+        """run `steps` complete configurations, stop when the described machine halts"""
+        for _ in range(steps):
+            figure = self.step()
+            self.step_count += 1
+            if figure is not None:
+                self.figures.append(figure)
+
+    def encode(self, complete=False):
+        """
+        complete: end with the blank "D" when the head is beyond the last square
+        """
+        right = self.right or ([0] if complete else [])
+        return (
+            "".join("D" + "C" * symbol for symbol in self.left)
+            + "D"
+            + "A" * self.m_config
+            + "".join("D" + "C" * symbol for symbol in right)
+        )
+
+    def configurations(self):
+        """
+        the F-squares after "::", a string for every configuration, figure and ":"
+        """
+        saved = self.left, self.m_config, self.right
+        self.reset()
+        try:
+            yield ":"
+            for _ in range(self.step_count):
+                yield self.encode(complete=True)
+                yield ":"
+                figure = self.step()
+                if figure is not None:
+                    yield figure
+                    yield ":"
+            yield self.encode()
+        finally:
+            self.left, self.m_config, self.right = saved
+
+    def get_sequence(self):
+        """the same as get_sequence of the universal machine after the last step"""
+        return self.instruction + "::" + "".join(self.configurations())
+
+    def get_tape(self):
+        """the tape of the universal machine, the E-squares are blank"""
+        tape = ["$", "$"]
+        for square in chain(self.instruction, ["::"], "".join(self.configurations())):
+            tape += [square, "_"]
+        return tape[:-1]
+
+    def get_figures(self):
+        return "".join(self.figures)
+
+    def get_reclaimed_sequence(self):
+        """the same as get_sequence of the universal machine from EntryReclaimUTM"""
+        figures = "".join(":" + figure for figure in self.figures)
+        return self.instruction + "::" + figures + ":" + self.encode()
+
+    def verify(self, steps, compiled=True, reclaim=False, max_steps=1 << 24):
+        """
+        run the universal machine until it has written `steps` complete configurations after the first one,
+        and compare its F-squares with the fast-path after every configuration
+
+        reclaim: verify the universal machine from EntryReclaimUTM
+        max_steps: the steps of the universal machine allowed for one configuration,
+            AssertionError when it needs more (it needs about 1.1M steps for the 30th configuration of 1/3)
+
+        The fast-path is stepped first: when the described machine halts, the universal machine would
+        move to the left forever, the verification stops there.
+        """
+        fast = FastUniversalMachine(self.instruction)
+        tm = create_universal_machine(
+            self.instruction, compiled=compiled, reclaim=reclaim
+        )
+        expected = (
+            fast.get_reclaimed_sequence if reclaim else fast.get_sequence
+        )
+        tm.set_history_policy("off")
+        boundary = UniversalBoundary(SkelotonCompiler.name2class)
+        tm.observers.append(boundary)
+        for step in range(steps):
+            try:
+                fast.run(steps=1)
+            except NoTransitionError:
+                break
+            boundary.found = False
+            start = tm.step_count
+            while not boundary.found:
+                done = tm.step_count - start
+                assert done < max_steps, (
+                    f"the universal machine has not written configuration {step + 1}"
+                    f" after {done} steps"
+                )
+                tm.run(steps=min(1 << 16, max_steps - done))
+            assert tm.get_sequence() == expected(), (
+                f"the fast-path differs from the universal machine after {step + 1} steps"
+            )
+        return tm
+
+
+class UniversalBoundary:
+    """
+    observer of the universal machine, stop the run when a new complete configuration is written:
+    the machine enters EraseAllMark before it looks for the next instruction
+    """
+
+    def __init__(self, name2class):
+        self.m_configs = {
+            name for name, cls in name2class.items() if cls == EraseAllMark.__name__
+        }
+        self.found = False
+
+    def record(self, writes, head, m_config, max_right, min_left):
+        self.found = m_config in self.m_configs
+        return self.found
+
+    def record_sweep(self, count, move, head, m_config, max_right, min_left):
+        return False
+
+
 def show_number_from_universal_tape(tm):
     seq = tm.get_sequence()
     number_seq = []
@@ -344,36 +682,57 @@ def show_number_from_universal_tape(tm):
     print(f"decimal is: {result}")
 
 
-def create_universal_machine(instruction):
-    from pprint import pprint
-
-    SkelotonCompiler.reset()
-    SkelotonCompiler.set_vocab(
-        {
-            "0",
-            "1",
-            "R",
-            "L",
-            "N",
-            "_",
-            "x",
-            "y",
-            "z",
-            "u",
-            "v",
-            "w",
-            ":",
-            ";",
-            "D",
-            "A",
-            "C",
-            "::",
-        }
-    )
-    b = EntryUTM()
-    table = SkelotonCompiler.compile()
-    print(f"there are {SkelotonCompiler.cnt} states in the universal machine")
-    tm = TuringMachine(table, SkelotonCompiler.get_m_config_name(b))
+UNIVERSAL_VOCAB = {
+    "0",
+    "1",
+    "R",
+    "L",
+    "N",
+    "_",
+    "x",
+    "y",
+    "z",
+    "u",
+    "v",
+    "w",
+    ":",
+    ";",
+    "D",
+    "A",
+    "C",
+    "::",
+}
+
+
+def create_universal_machine(
+    instruction, compiled=False, fast=False, verify=0, cache=False, reclaim=False
+):
+    """
+    compiled: run the universal machine with the compiled engine in compiled.py
+    fast: run the described machine directly, see FastUniversalMachine
+    verify: with fast, compare the fast-path with the universal machine for the first `verify` steps
+    cache: load the compiled table from the cache (and store it there), see cache.py
+    reclaim: keep only the last complete configuration on the tape, see EntryReclaimUTM
+    """
+    if fast:
+        tm = FastUniversalMachine(instruction)
+        if verify:
+            tm.verify(verify, compiled=True, reclaim=reclaim)
+        return tm
+
+    start = EntryReclaimUTM if reclaim else EntryUTM
+    if cache:
+        table, entry, _ = compile_abbreviated(start, UNIVERSAL_VOCAB)
+    else:
+        SkelotonCompiler.reset()
+        SkelotonCompiler.set_vocab(set(UNIVERSAL_VOCAB))
+        b = start()
+        table = SkelotonCompiler.compile()
+        entry = SkelotonCompiler.get_m_config_name(b)
+    states = len(SkelotonCompiler.name2class)
+    print(f"there are {states} states in the universal machine")
+    machine = CompiledTuringMachine if compiled else TuringMachine
+    tm = machine(table, entry)
     tm.load_instruction(instruction)
     return tm
 
@@ -474,7 +833,140 @@ def test_universal_machine():
     return tm
 
 
+def test_fast_universal_machine():
+    import io
+    import time
+    from contextlib import redirect_stdout
+
+    print("----------test the fast-path of the universal machine----------")
+    tables = []
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["1", "R"], "b"))
+    tables.append(table)
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["1", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["_", "L"], "d"))
+    table.add_rule(TransitionRule("d", "1", ["0", "N"], "e"))
+    table.add_rule(TransitionRule("e", "0", ["1", "L"], "f"))
+    table.add_rule(TransitionRule("f", "1", ["1", "R"], "b"))
+    tables.append(table)
+    # the universal machine tries (c, "_") first when c scans "0", and prints no figure over "0"
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "L"], "c"))
+    table.add_rule(TransitionRule("c", "0", ["1", "R"], "b"))
+    table.add_rule(TransitionRule("b", "1", ["_", "L"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["1", "N"], "b"))
+    tables.append(table)
+    for table in tables:
+        instruction = Assembler(table, {"0", "1", "$"}, {"_", "x"}).standard_description
+        with redirect_stdout(io.StringIO()):
+            tm = create_universal_machine(instruction, fast=True, verify=6)
+        tm.run(steps=6)
+        print(tm.get_sequence())
+
+    # the described machine halts after its first step
+    with redirect_stdout(io.StringIO()):
+        tm = create_universal_machine(";DADDCRDAA;DAADCDCCRDA", fast=True, verify=3)
+    tm.run(steps=1)
+    try:
+        tm.run(steps=1)
+        raise AssertionError("the described machine halts")
+    except NoTransitionError:
+        pass
+    try:
+        with redirect_stdout(io.StringIO()):
+            tm.verify(2, max_steps=1000)
+        raise AssertionError("the universal machine needs more than 1000 steps")
+    except AssertionError as error:
+        assert "after 1000 steps" in str(error), error
+
+    start = time.perf_counter()
+    instruction = Assembler(tables[0], {"0", "1", "$"}, {"_", "x"}).standard_description
+    tm = create_universal_machine(instruction, fast=True)
+    tm.run(steps=100000)
+    assert tm.get_figures() == "01" * 50000
+    print(f"100000 steps in {time.perf_counter() - start:.2f}s")
+
+
+def test_reclaim_universal_machine():
+    import io
+    import time
+    from contextlib import redirect_stdout
+
+    print("----------test the universal machine which reclaims its tape----------")
+    tables = []
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["1", "R"], "b"))
+    tables.append(table)
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["1", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["_", "L"], "d"))
+    table.add_rule(TransitionRule("d", "1", ["0", "N"], "e"))
+    table.add_rule(TransitionRule("e", "0", ["1", "L"], "f"))
+    table.add_rule(TransitionRule("f", "1", ["1", "R"], "b"))
+    tables.append(table)
+    # prints one figure, then goes back and forth over two squares
+    table = Table()
+    table.add_rule(TransitionRule("b", "_", ["0", "R"], "c"))
+    table.add_rule(TransitionRule("c", "_", ["_", "L"], "d"))
+    table.add_rule(TransitionRule("d", "0", ["0", "R"], "c"))
+    tables.append(table)
+    instructions = [
+        Assembler(table, {"0", "1", "$"}, {"_", "x"}).standard_description
+        for table in tables
+    ]
+    for instruction in instructions:
+        with redirect_stdout(io.StringIO()):
+            tm = create_universal_machine(
+                instruction, fast=True, verify=6, reclaim=True
+            )
+        tm.run(steps=6)
+        print(tm.get_reclaimed_sequence())
+
+    # the steps of the universal machines for every complete configuration
+    steps = 30
+    for instruction in [instructions[0], instructions[2]]:
+        results = {}
+        for reclaim in [False, True]:
+            with redirect_stdout(io.StringIO()):
+                tm = create_universal_machine(
+                    instruction, compiled=True, reclaim=reclaim
+                )
+            tm.set_history_policy("off")
+            boundary = UniversalBoundary(SkelotonCompiler.name2class)
+            tm.observers.append(boundary)
+            cycles = []
+            start = time.perf_counter()
+            for _ in range(steps):
+                boundary.found = False
+                begin = tm.step_count
+                while not boundary.found:
+                    tm.run(steps=1 << 12)
+                cycles.append(tm.step_count - begin)
+            elapsed = time.perf_counter() - start
+            results[reclaim] = (cycles, tm.max_right, tm.get_sequence())
+            name = "EntryReclaimUTM" if reclaim else "EntryUTM"
+            print(
+                f"{name:>15}: {steps} configurations in {elapsed:.2f}s,"
+                f" {cycles[0]} steps for the first one, {cycles[-1]} for the last one,"
+                f" {tm.max_right} squares"
+            )
+        cycles, max_right, sequence = results[False]
+        reclaimed_cycles, reclaimed_max_right, reclaimed = results[True]
+        figures = "".join(square for square in sequence if square in "01")
+        assert figures == "".join(square for square in reclaimed if square in "01")
+        assert reclaimed_max_right < max_right
+        assert sum(reclaimed_cycles) < sum(cycles)
+    # the tape of the last machine stays the same, and so does the cost of every configuration
+    assert reclaimed_cycles[-1] == reclaimed_cycles[-3] < cycles[-1]
+    assert cycles[-1] > cycles[-3]
+
+
 if __name__ == "__main__":
+    test_fast_universal_machine()
+    test_reclaim_universal_machine()
     show_1_3_table_description()
     add_1_3_code_to_machine()
     test_mark_right()